@@ -6,12 +6,17 @@ from django.contrib.auth.models import Group
 from django.db.models.signals import post_save, post_init, pre_save
 
 from utils.helper import send_email_sms_and_notification
+from utils.roles import revoke_user_tokens
+from .backends import active_users
 from .models import User, Role
-from .signals import post_save_method, remember_state_method, pre_save_method
+from .signals import post_save_method, remember_state_method, pre_save_method, forget_active_state
 
 
 def block_user(modelAdmin, request, queryset):
+    user_ids = list(queryset.values_list('id', flat=True))
     queryset.update(is_active=False)
+    active_users.invalidate(user_ids)
+    revoke_user_tokens(user_ids)
     email_ids = queryset.values_list('email', flat=True)
     send_email_sms_and_notification(action_name="user_blocked",
                                     email_ids=list(email_ids))
@@ -22,6 +27,7 @@ block_user.short_description = "Block selected Users"
 
 def unblock_user(modelAdmin, request, queryset):
     queryset.update(is_active=True)
+    active_users.invalidate(list(queryset.values_list('id', flat=True)))
     email_ids = queryset.values_list('email', flat=True)
     send_email_sms_and_notification(action_name="user_unblocked",
                                     email_ids=list(email_ids))
@@ -57,6 +63,7 @@ class UserAdmin(admin.ModelAdmin):
 
 pre_save.connect(pre_save_method, sender=User)
 post_save.connect(post_save_method, sender=User)
+post_save.connect(forget_active_state, sender=User)
 post_init.connect(remember_state_method, sender=User)
 
 admin.site.unregister(Group)
@@ -0,0 +1,142 @@
+"""
+Authentication building the user from the claims of the access token
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from eon_backend.settings.common import ACTIVE_USER_CACHE_SIZE, ACTIVE_USER_CACHE_TIMEOUT
+from utils.roles import get_token_version
+
+ROLE_CLAIM = 'role'
+PROFILE_ID_CLAIM = 'profile_id'
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+def add_role_claims(token, profile):
+    """
+    Function to sign the role of the user into a token
+    :param token: refresh token, the access tokens derived from it copy the claims
+    :param profile: user profile with its role
+    """
+    token[ROLE_CLAIM] = profile.role.role
+    token[PROFILE_ID_CLAIM] = profile.id
+    token[TOKEN_VERSION_CLAIM] = profile.token_version
+
+
+class ActiveUserCache:
+    """
+    Least recently used cache of the active state of the users, entries expire after a few
+    seconds so a change made by another process is seen shortly
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_active(self, user_id):
+        """
+        Function to tell if the user exists and is active
+        :param user_id: id of the user
+        :return: True if active, False if blocked, None if the user does not exist
+        """
+        from authentication.models import User
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        is_active = User.objects.filter(id=user_id).values_list('is_active', flat=True).first()
+        with self._lock:
+            self._entries[user_id] = (now + self.timeout, is_active)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return is_active
+
+    def invalidate(self, user_ids):
+        """
+        Function to drop the state of the given users
+        :param user_ids: ids of the users
+        """
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+active_users = ActiveUserCache(ACTIVE_USER_CACHE_SIZE, ACTIVE_USER_CACHE_TIMEOUT)
+
+
+class ClaimUser(TokenUser):  # pylint: disable=abstract-method
+    """
+    Stateless user built from the claims of a validated access token, it has no database row
+    to save or delete
+    """
+
+    @cached_property
+    def role(self):
+        """
+        :return: role name signed into the token, None for a token issued without it
+        """
+        return self.token.get(ROLE_CLAIM)
+
+    @cached_property
+    def profile_id(self):
+        """
+        :return: id of the profile of the user signed into the token
+        """
+        return self.token.get(PROFILE_ID_CLAIM)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates requests without loading the user, its active state is read from the
+    in process cache
+    """
+
+    def get_user(self, validated_token):
+        """
+        Function to build the user from the claims of the token
+        :param validated_token: validated access token
+        :return: ClaimUser object, raises AuthenticationFailed if the user is missing or blocked
+        """
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        user = ClaimUser(validated_token)
+        is_active = active_users.is_active(user.id)
+        if is_active is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+class RoleClaimJWTAuthentication(StatelessJWTAuthentication):
+    """
+    Stateless authentication also trusting the role signed into the token, the only lookup
+    left is the token version of the user which is served from the cache
+    """
+
+    def get_user(self, validated_token):
+        """
+        Function to build the user from the claims of the token, a token signed with a role
+        is rejected once the token version of the user has changed
+        :param validated_token: validated access token
+        :return: ClaimUser object, raises AuthenticationFailed if the token is revoked
+        """
+        user = super().get_user(validated_token)
+        if ROLE_CLAIM in validated_token and \
+                validated_token.get(TOKEN_VERSION_CLAIM) != get_token_version(user.id):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        return user
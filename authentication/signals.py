@@ -1,10 +1,13 @@
 from utils.helper import send_email_sms_and_notification
+from utils.roles import revoke_user_tokens
+from .backends import active_users
 
 
 def post_save_method(sender, **kwargs):
     instance = kwargs.get('instance')
     if instance.method_name == 'old_instance':
         if instance.previous_state and not instance.is_active:
+            revoke_user_tokens([instance.id])
             send_email_sms_and_notification(action_name="user_blocked",
                                             email_ids=[instance.email])
         elif not instance.previous_state and instance.is_active:
@@ -24,3 +27,10 @@ def pre_save_method(sender, **kwargs):
         instance.method_name = 'new_instance'
     else:
         instance.method_name = 'old_instance'
+
+
+def forget_active_state(sender, **kwargs):
+    """
+    Drops the cached active state of the saved user
+    """
+    active_users.invalidate([kwargs.get('instance').id])
@@ -4,9 +4,14 @@ Write test cases for authentication module here
 
 import json
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
 
-from authentication.models import Role, VerificationCode
+from authentication.backends import active_users
+from authentication.models import Role, User, VerificationCode
+from core.models import UserProfile
 
 
 class AuthenticationTestCase(TestCase):
@@ -241,3 +246,69 @@ class AuthenticationTestCase(TestCase):
                                           content_type='application/json')
 
         self.assertEqual(reset_response.status_code, 400)
+
+    def test_login_token_carries_role_claims(self):
+        """
+        Unit test for login issuing an access token signed with the role of the user
+        """
+        # Setup
+        content = {"email": "user123@mail.com", "password": "user123"}
+
+        # Run
+        login = self.client.post('/authentication/login', json.dumps(content),
+                                 content_type='application/json')
+        token = AccessToken(login.data['data']['access'])
+
+        # Check
+        self.assertEqual(token['role'], 'subscriber')
+        self.assertEqual(token['profile_id'],
+                         UserProfile.objects.get(user__email="user123@mail.com").id)
+        self.assertEqual(token['token_version'], 0)
+
+    def test_token_authentication_without_user_lookup(self):
+        """
+        Unit test for token authentication reading the active state from the process cache
+        """
+        # Setup
+        content = {"email": "user123@mail.com", "password": "user123"}
+        login = self.client.post('/authentication/login', json.dumps(content),
+                                 content_type='application/json')
+        authorization = "Bearer {}".format(login.data['data']['access'])
+        user = User.objects.get(email="user123@mail.com")
+
+        # Run
+        self.client.get('/core/event-type', HTTP_AUTHORIZATION=authorization)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/core/event-type', HTTP_AUTHORIZATION=authorization)
+        user_queries = [query for query in context.captured_queries
+                        if 'FROM "authentication_user"' in query['sql']]
+        User.objects.filter(id=user.id).update(is_active=False)
+        active_users.invalidate([user.id])
+        blocked_response = self.client.get('/core/event-type', HTTP_AUTHORIZATION=authorization)
+
+        # Check
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, [])
+        self.assertEqual(blocked_response.status_code, 401)
+
+    def test_role_change_revokes_tokens_only_when_role_changed(self):
+        """
+        Unit test for the token version bumped by a role change and kept by a save of a
+        profile loaded without its role
+        """
+        # Setup
+        profile_id = UserProfile.objects.get(user__email="user123@mail.com").id
+        organizer = Role.objects.get(role="organizer")
+
+        # Run
+        deferred_profile = UserProfile.objects.only('id', 'name').get(id=profile_id)
+        deferred_profile.name = "user 123"
+        deferred_profile.save()
+        unchanged_version = UserProfile.objects.get(id=profile_id).token_version
+        profile = UserProfile.objects.get(id=profile_id)
+        profile.role = organizer
+        profile.save()
+
+        # Check
+        self.assertEqual(unchanged_version, 0)
+        self.assertEqual(UserProfile.objects.get(id=profile_id).token_version, 1)
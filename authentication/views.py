@@ -18,6 +18,7 @@ from eon_backend.settings.common import ADMIN_EMAIL, LOGGER_SERVICE
 from utils.common import api_error_response, api_success_response, produce_object_for_user
 from utils.helper import send_email_sms_and_notification
 from core.models import UserProfile
+from .backends import add_role_claims
 from .models import User, Role, VerificationCode
 
 logger = LOGGER_SERVICE
@@ -190,6 +191,10 @@ def get_token_for_user(user):
     }
     """
     refresh = RefreshToken.for_user(user)
+    try:
+        add_role_claims(refresh, UserProfile.objects.select_related('role').get(user=user))
+    except UserProfile.DoesNotExist:
+        pass
 
     return {
         'refresh': str(refresh),
@@ -2,6 +2,7 @@
 Starting the core api from here
 """
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
@@ -9,3 +10,17 @@ class CoreConfig(AppConfig):
     Providing name for admin
     """
     name = 'core'
+
+    def ready(self):
+        from core.models import Event, Subscription, WishList, UserFeedback, UserProfile
+        from core.signals import update_event_search_index, remove_event_search_index, \
+            invalidate_event_catalogue, invalidate_event_flags, invalidate_user_role
+
+        post_save.connect(update_event_search_index, sender=Event)
+        post_delete.connect(remove_event_search_index, sender=Event)
+        post_save.connect(invalidate_event_catalogue, sender=Event)
+        post_save.connect(invalidate_event_catalogue, sender=UserFeedback)
+        for sender in (Subscription, WishList, UserFeedback):
+            post_save.connect(invalidate_event_flags, sender=sender)
+        post_save.connect(invalidate_user_role, sender=UserProfile)
+        post_delete.connect(invalidate_user_role, sender=UserProfile)
@@ -0,0 +1,149 @@
+"""
+Shared cache of the event catalogue is here.
+The serialized event list is cached once per filter combination under a catalogue version,
+which is bumped whenever events change. The per user flags (subscribed, wishlisted,
+feedback given) are kept as small per user sets of event ids and merged at response time.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from eon_backend.settings.common import CATALOGUE_CACHE_TIMEOUT, USER_FLAGS_CACHE_TIMEOUT
+
+CATALOGUE_VERSION_KEY = "event_catalogue_version"
+CATALOGUE_PAGE_KEY = "event_catalogue:{version}:{digest}"
+USER_FLAGS_VERSION_KEY = "event_flags_version:{user_id}"
+USER_FLAGS_KEY = "event_flags:{user_id}:{version}"
+MODIFIED_KEY = "{key}:modified"
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so a lost counter never reuses the version of old entries
+        now = time.time()
+        cache.add(key, int(now * 1000), None)
+        cache.add(MODIFIED_KEY.format(key=key), now, None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+        cache.set(MODIFIED_KEY.format(key=key), time.time(), None)
+    except ValueError:
+        _get_version(key)
+
+
+def _get_modified(key):
+    _get_version(key)
+    modified_key = MODIFIED_KEY.format(key=key)
+    modified = cache.get(modified_key)
+    if modified is None:
+        cache.add(modified_key, time.time(), None)
+        modified = cache.get(modified_key)
+    return modified
+
+
+def get_catalogue_version():
+    """
+    :return: current version of the event catalogue
+    """
+    return _get_version(CATALOGUE_VERSION_KEY)
+
+
+def bump_catalogue_version():
+    """
+    Function to invalidate every cached catalogue page, called whenever an event changes.
+    The version is bumped once the transaction commits, a reader caching the old state
+    before that does it under the old version.
+    """
+    transaction.on_commit(lambda: _bump_version(CATALOGUE_VERSION_KEY))
+
+
+def get_user_flags_version(user_id):
+    """
+    :param user_id: id of the user
+    :return: current version of the event flags of the user
+    """
+    return _get_version(USER_FLAGS_VERSION_KEY.format(user_id=user_id))
+
+
+def get_last_modified(user_id):
+    """
+    Function to give the time of the last change seen by the event list of a user
+    :param user_id: id of the user
+    :return: unix timestamp of the last catalogue or user flags change
+    """
+    return max(_get_modified(CATALOGUE_VERSION_KEY),
+               _get_modified(USER_FLAGS_VERSION_KEY.format(user_id=user_id)))
+
+
+def get_catalogue_page(params, build_page):
+    """
+    Function to return the cached catalogue page for the given filters, building it once
+    per catalogue version
+    :param params: filters identifying the page
+    :param build_page: function building the page when it is not cached
+    :return: catalogue page
+    """
+    digest = hashlib.md5(json.dumps(params, sort_keys=True).encode('UTF-8')).hexdigest()
+    key = CATALOGUE_PAGE_KEY.format(version=get_catalogue_version(), digest=digest)
+    page = cache.get(key)
+    if page is None:
+        page = build_page()
+        cache.set(key, page, CATALOGUE_CACHE_TIMEOUT)
+    return page
+
+
+def get_user_event_flags(user_id):
+    """
+    Function to return the ids of the events subscribed, wishlisted and reviewed by a user
+    :param user_id: id of the user
+    :return: dict of flag name and frozenset of event ids
+    """
+    from core.models import Subscription, WishList, UserFeedback
+
+    key = USER_FLAGS_KEY.format(user_id=user_id, version=get_user_flags_version(user_id))
+    flags = cache.get(key)
+    if flags is None:
+        flags = {
+            'is_subscribed': frozenset(Subscription.objects.filter(
+                user_id=user_id, is_active=True).values_list('event_id', flat=True)),
+            'is_wishlisted': frozenset(WishList.objects.filter(
+                user_id=user_id, is_active=True).values_list('event_id', flat=True)),
+            'feedback_given': frozenset(UserFeedback.objects.filter(
+                user_id=user_id, is_active=True).values_list('event_id', flat=True)),
+        }
+        cache.set(key, flags, USER_FLAGS_CACHE_TIMEOUT)
+    return flags
+
+
+def invalidate_user_event_flags(user_id):
+    """
+    Function to drop the cached flags of a user, called whenever its subscriptions,
+    wishlist or feedback change, once the transaction commits
+    :param user_id: id of the user
+    """
+    key = USER_FLAGS_VERSION_KEY.format(user_id=user_id)
+    transaction.on_commit(lambda: _bump_version(key))
+
+
+def merge_user_event_flags(rows, flags):
+    """
+    Function to overlay the per user flags on cached catalogue rows
+    :param rows: catalogue rows, they are copied and not modified
+    :param flags: flags returned by get_user_event_flags
+    :return: list of rows with the flags
+    """
+    data = []
+    for row in rows:
+        row = dict(row)
+        for flag, event_ids in flags.items():
+            row[flag] = row['id'] in event_ids
+        data.append(row)
+    return data
@@ -14,3 +14,11 @@ class CoreAppException(Exception):
             self.default_code = default_code
         if status_code:
             self.status_code = status_code
+
+
+class TicketsUnavailable(CoreAppException):
+    """
+    Raised when an event has fewer tickets left than requested
+    """
+    default_detail = "Requested number of tickets are more than available"
+    status_code = 400
@@ -0,0 +1,157 @@
+"""
+Ticket holds: the tickets are reserved at once when a user starts a purchase, the card is
+charged in the request without any lock held, and a celery task then confirms the paid hold
+into a subscription. Only the payment id and amounts are kept on the hold, never the card.
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.inventory import release_tickets, reserve_tickets
+from core.models import Subscription, TicketHold
+from eon_backend.settings.common import LOGGER_SERVICE, TICKET_HOLD_TIMEOUT
+from utils.constants import TICKET_HOLD_STATUS
+from utils.payment import PaymentServiceError, payment_client
+
+logger = LOGGER_SERVICE
+
+
+def create_ticket_hold(user_id, event_id, no_of_tickets):
+    """
+    Function to reserve tickets of an event for a user until the hold expires
+    :param user_id: id of the user
+    :param event_id: id of the event
+    :param no_of_tickets: tickets to hold
+    :return: the hold, None if the event has fewer tickets left
+    """
+    with transaction.atomic():
+        if not reserve_tickets(event_id, no_of_tickets):
+            return None
+        return TicketHold.objects.create(
+            user_id=user_id, event_id=event_id, no_of_tickets=no_of_tickets,
+            expires_on=timezone.now() + timedelta(seconds=TICKET_HOLD_TIMEOUT))
+
+
+def close_ticket_hold(hold, status):
+    """
+    Function to move a pending hold to its final status, a hold reaped or processed meanwhile
+    is left untouched
+    :param hold: hold object
+    :param status: final status
+    :return: True if this call closed the hold
+    """
+    return bool(TicketHold.objects.filter(id=hold.id, status=TICKET_HOLD_STATUS['pending']).update(
+        status=status, updated_on=timezone.now()))
+
+
+def confirm_ticket_hold(hold):
+    """
+    Function to turn a paid hold into a subscription, its tickets are already reserved
+    :param hold: hold object with its recorded payment
+    :return: True if confirmed, False if the hold was closed meanwhile
+    """
+    with transaction.atomic():
+        if not close_ticket_hold(hold, TICKET_HOLD_STATUS['confirmed']):
+            return False
+        subscription = Subscription(user_id=hold.user_id, event_id=hold.event_id,
+                                    no_of_tickets=hold.no_of_tickets, id_payment=hold.id_payment,
+                                    amount=hold.amount, discount_amount=hold.discount_amount)
+        subscription.save(tickets_reserved=True)
+        TicketHold.objects.filter(id=hold.id).update(subscription=subscription)
+    logger.log_info(f"Ticket hold {hold.id} confirmed as subscription {subscription.id}")
+    return True
+
+
+def fail_ticket_hold(hold):
+    """
+    Function to release the tickets of a hold whose payment failed
+    :param hold: hold object
+    :return: True if the hold was released by this call
+    """
+    with transaction.atomic():
+        if not close_ticket_hold(hold, TICKET_HOLD_STATUS['failed']):
+            return False
+        release_tickets(hold.event_id, hold.no_of_tickets)
+    logger.log_info(f"Ticket hold {hold.id} failed, tickets released")
+    return True
+
+
+def record_hold_payment(hold, payment_object):
+    """
+    Function to record the payment taken for a pending hold, the hold is then confirmed from
+    it without the card
+    :param hold: hold object
+    :param payment_object: payment details returned by the payment service
+    :return: True if recorded, False if the hold expired while the card was charged
+    """
+    hold.id_payment = payment_object['id']
+    hold.amount = payment_object['total_amount']
+    hold.discount_amount = payment_object['discount_amount']
+    return bool(TicketHold.objects.filter(
+        id=hold.id, status=TICKET_HOLD_STATUS['pending'], id_payment__isnull=True
+    ).update(id_payment=hold.id_payment, amount=hold.amount, discount_amount=hold.discount_amount))
+
+
+def charge_ticket_hold(hold, payment_data):
+    """
+    Function to charge the card of a hold in the request, the card details are only used
+    here and are not stored. A payment taken after the hold expired is refunded at once.
+    :param hold: pending hold object
+    :param payment_data: card and amount details of the purchase
+    :return: status of the hold, pending until the paid hold is confirmed
+    """
+    try:
+        payment_object = payment_client.create_payment(hold.user_id, payment_data)
+    except PaymentServiceError as err:
+        logger.log_error(f"Payment of ticket hold {hold.id} failed: {err}")
+        fail_ticket_hold(hold)
+        return TicketHold.objects.values_list('status', flat=True).get(id=hold.id)
+    if record_hold_payment(hold, payment_object):
+        return TICKET_HOLD_STATUS['pending']
+
+    logger.log_error(f"Ticket hold {hold.id} expired before payment {payment_object['id']}, "
+                     f"refunding")
+    refund_object = payment_client.refund_payment(hold.user_id, payment_data, payment_object)
+    if refund_object is not None:
+        TicketHold.objects.filter(id=hold.id).update(id_refund=refund_object['id'])
+    return TicketHold.objects.values_list('status', flat=True).get(id=hold.id)
+
+
+def confirm_paid_hold(hold_id):
+    """
+    Function to confirm a hold once its payment is recorded, a hold closed meanwhile or never
+    paid is left as it is
+    :param hold_id: id of the hold
+    :return: status of the hold
+    """
+    hold = TicketHold.objects.get(id=hold_id)
+    if hold.status != TICKET_HOLD_STATUS['pending'] or hold.id_payment is None:
+        return hold.status
+    if confirm_ticket_hold(hold):
+        return TICKET_HOLD_STATUS['confirmed']
+    return TicketHold.objects.values_list('status', flat=True).get(id=hold_id)
+
+
+def release_expired_holds():
+    """
+    Function to expire the unpaid pending holds past their expiry and give their tickets back,
+    with one release per event. The paid holds past their expiry, whose confirmation was lost,
+    are confirmed instead.
+    :return: number of holds expired
+    """
+    expired_on = timezone.now()
+    for hold in TicketHold.objects.filter(status=TICKET_HOLD_STATUS['pending'],
+                                          expires_on__lte=expired_on, id_payment__isnull=False):
+        confirm_ticket_hold(hold)
+    with transaction.atomic():
+        holds = list(TicketHold.objects.select_for_update(skip_locked=True).filter(
+            status=TICKET_HOLD_STATUS['pending'], expires_on__lte=expired_on,
+            id_payment__isnull=True
+        ).only('id', 'event_id', 'no_of_tickets').order_by('event_id'))
+        TicketHold.objects.filter(id__in=[hold.id for hold in holds]).update(
+            status=TICKET_HOLD_STATUS['expired'], updated_on=timezone.now())
+        for event_id, event_holds in groupby(holds, key=lambda hold: hold.event_id):
+            release_tickets(event_id, sum(hold.no_of_tickets for hold in event_holds))
+    return len(holds)
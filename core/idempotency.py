@@ -0,0 +1,129 @@
+"""
+Idempotency keys of the purchase api, a request retried with the same Idempotency-Key header
+gets the stored response of the first one instead of being processed again
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+from eon_backend.settings.common import IDEMPOTENCY_KEY_LEASE, IDEMPOTENCY_KEY_TTL, LOGGER_SERVICE
+from utils.common import api_error_response
+
+logger = LOGGER_SERVICE
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+
+def get_request_hash(request):
+    """
+    Function to fingerprint a request so that a key reused for another request is detected
+    :return: hex digest of the path and body
+    """
+    return hashlib.sha256(request.path.encode('UTF-8') + b'\n' + request.body).hexdigest()
+
+
+def claim_key(user_id, key, request_hash):
+    """
+    Function to record a key as in flight for IDEMPOTENCY_KEY_LEASE seconds, the unique index
+    on user and key makes a duplicate fail on insert. A retry of the same request takes over
+    a key whose lease ran out without a response stored.
+    :return: (stored key, True if this request claimed it)
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=IDEMPOTENCY_KEY_LEASE)
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user_id=user_id, key=key,
+                                                 request_hash=request_hash,
+                                                 locked_until=locked_until), True
+    except IntegrityError:
+        stored_key = IdempotencyKey.objects.get(user_id=user_id, key=key)
+    if stored_key.created_on > now - timedelta(seconds=IDEMPOTENCY_KEY_TTL):
+        return stored_key, take_over_key(stored_key, request_hash, now, locked_until)
+    # an expired key not purged yet is reused as a new one
+    expired_keys = IdempotencyKey.objects.filter(id=stored_key.id, created_on=stored_key.created_on)
+    if expired_keys.delete()[0]:
+        return claim_key(user_id, key, request_hash)
+    return IdempotencyKey.objects.get(user_id=user_id, key=key), False
+
+
+def take_over_key(stored_key, request_hash, now, locked_until):
+    """
+    Function to claim a key left in flight by a request which died before storing its
+    response, once its lease ran out. Only one of concurrent retries gets it.
+    :return: True if this request claimed the key
+    """
+    if stored_key.status_code is not None or stored_key.request_hash != request_hash or \
+            stored_key.locked_until is None or stored_key.locked_until > now:
+        return False
+    taken = IdempotencyKey.objects.filter(id=stored_key.id, status_code__isnull=True,
+                                          locked_until=stored_key.locked_until).update(
+        locked_until=locked_until)
+    if not taken:
+        return False
+    logger.log_info(f"Idempotency-Key {stored_key.key} of user {stored_key.user_id} taken over "
+                    f"after its lease")
+    stored_key.locked_until = locked_until
+    return True
+
+
+def idempotent(view_method):
+    """
+    Decorator for the api methods that must run at most once per Idempotency-Key of a user.
+    A duplicate gets the stored response, 409 while the first request is still running within
+    its lease and 422 when the key was used for a different request. Only the final 2xx and
+    4xx responses are stored, a request failing with a server error can be retried.
+    """
+    @wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(view, request, *args, **kwargs)
+        if len(key) > 255:
+            return api_error_response(message="Idempotency-Key is too long", status=400)
+
+        request_hash = get_request_hash(request)
+        stored_key, claimed = claim_key(view.user_id, key, request_hash)
+        if not claimed:
+            if stored_key.request_hash != request_hash:
+                return api_error_response(
+                    message="Idempotency-Key was already used for a different request", status=422)
+            if stored_key.status_code is None:
+                return api_error_response(
+                    message="A request with this Idempotency-Key is in progress", status=409)
+            logger.log_info(f"Response replayed for Idempotency-Key {key} of user {view.user_id}")
+            response = Response(json.loads(stored_key.response), status=stored_key.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_method(view, request, *args, **kwargs)
+        except Exception:
+            # nothing was stored, the client may retry with the same key
+            stored_key.delete()
+            raise
+        if response.status_code >= 500:
+            # a server error is not final, the client may retry with the same key
+            stored_key.delete()
+            return response
+        IdempotencyKey.objects.filter(id=stored_key.id).update(
+            status_code=response.status_code,
+            response=json.dumps(response.data, cls=DjangoJSONEncoder))
+        return response
+    return wrapper
+
+
+def purge_idempotency_keys():
+    """
+    Function to delete the keys older than their time to live
+    :return: number of keys deleted
+    """
+    return IdempotencyKey.objects.filter(
+        created_on__lte=timezone.now() - timedelta(seconds=IDEMPOTENCY_KEY_TTL)).delete()[0]
@@ -0,0 +1,171 @@
+"""
+Ticket inventory of the events, every change of the sold tickets is a single conditional
+UPDATE so concurrent buyers can never oversell an event.
+
+An event with a hot sale can be sharded: its tickets are split over EventTicketShard rows,
+a reservation updates a random shard, and the sold tickets of the event are the sum of
+its shards, copied to the event row by the sync_sharded_sold_tickets task.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core.catalogue import bump_catalogue_version
+from eon_backend.settings.common import LOGGER_SERVICE
+
+logger = LOGGER_SERVICE
+
+
+def change_sold_tickets(event_id, no_of_tickets):
+    """
+    Function to add to or give back the sold tickets of an event, the row is only updated
+    when the sold tickets stay between zero and the tickets of the event. The cached catalogue
+    is not invalidated, its sold tickets and popularity order catch up when its pages expire.
+    :param event_id: id of the event
+    :param no_of_tickets: tickets to add, negative to give tickets back
+    :return: True if the change was applied
+    """
+    from core.models import Event, EventTicketShard, popularity_expression
+
+    no_of_tickets = int(no_of_tickets)
+    queryset = Event.objects.filter(id=event_id, ticket_shards=0)
+    if no_of_tickets > 0:
+        queryset = queryset.filter(sold_tickets__lte=F('no_of_tickets') - no_of_tickets)
+    elif no_of_tickets < 0:
+        queryset = queryset.filter(sold_tickets__gte=-no_of_tickets)
+    sold_tickets = F('sold_tickets') + no_of_tickets
+    updated = queryset.update(sold_tickets=sold_tickets,
+                              popularity=popularity_expression(sold_tickets),
+                              updated_on=timezone.now())
+    if updated:
+        return True
+    if EventTicketShard.objects.filter(event_id=event_id).exists():
+        return change_sharded_sold_tickets(event_id, no_of_tickets)
+    logger.log_info(f"Sold tickets of event {event_id} not changed by {no_of_tickets}")
+    return False
+
+
+def change_shard(queryset, no_of_tickets):
+    """
+    Function to apply a change of sold tickets to a single shard within its bounds
+    :param queryset: queryset matching one shard
+    :param no_of_tickets: tickets to add, negative to give tickets back
+    :return: True if the change was applied
+    """
+    if no_of_tickets > 0:
+        queryset = queryset.filter(sold_tickets__lte=F('no_of_tickets') - no_of_tickets)
+    else:
+        queryset = queryset.filter(sold_tickets__gte=-no_of_tickets)
+    return bool(queryset.update(sold_tickets=F('sold_tickets') + no_of_tickets))
+
+
+def change_sharded_sold_tickets(event_id, no_of_tickets):
+    """
+    Function to change the sold tickets of a sharded event. The shards are tried one by one
+    from a random starting shard, and a change no single shard can take is split over the
+    shards with all of them locked.
+    :param event_id: id of the event
+    :param no_of_tickets: tickets to add, negative to give tickets back
+    :return: True if the change was applied
+    """
+    from core.models import EventTicketShard
+
+    shards = list(EventTicketShard.objects.filter(event_id=event_id).values_list('id', flat=True))
+    start = random.randrange(len(shards))
+    for shard_id in shards[start:] + shards[:start]:
+        if change_shard(EventTicketShard.objects.filter(id=shard_id), no_of_tickets):
+            return True
+
+    with transaction.atomic():
+        locked_shards = list(EventTicketShard.objects.select_for_update().filter(
+            event_id=event_id).order_by('shard'))
+        if no_of_tickets > 0:
+            available = [shard.no_of_tickets - shard.sold_tickets for shard in locked_shards]
+        else:
+            available = [shard.sold_tickets for shard in locked_shards]
+        if sum(available) < abs(no_of_tickets):
+            logger.log_info(f"Sold tickets of event {event_id} not changed by {no_of_tickets}")
+            return False
+        remaining = abs(no_of_tickets)
+        for shard, shard_available in zip(locked_shards, available):
+            taken = min(remaining, shard_available)
+            if taken:
+                shard.sold_tickets += taken if no_of_tickets > 0 else -taken
+                remaining -= taken
+        EventTicketShard.objects.bulk_update(locked_shards, ['sold_tickets'])
+    return True
+
+
+def split(total, parts):
+    """
+    Function to split a number in nearly equal parts, the sold tickets split this way never
+    exceed the tickets of the same shard
+    :return: list of the parts, the first ones one larger
+    """
+    return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
+
+
+@transaction.atomic()
+def shard_event_tickets(event_id, shards):
+    """
+    Function to spread the inventory of an event over shards, or to gather it back into the
+    event row when shards is 0
+    :param event_id: id of the event
+    :param shards: number of shards
+    """
+    from core.models import Event, EventTicketShard
+
+    event = Event.objects.select_for_update().get(id=event_id)
+    sold_tickets = EventTicketShard.objects.select_for_update().filter(
+        event_id=event_id).aggregate(sold_tickets=Sum('sold_tickets'))['sold_tickets']
+    if sold_tickets is None:
+        sold_tickets = event.sold_tickets
+    EventTicketShard.objects.filter(event_id=event_id).delete()
+    if shards:
+        capacities = split(event.no_of_tickets, shards)
+        sold = split(sold_tickets, shards)
+        EventTicketShard.objects.bulk_create(
+            [EventTicketShard(event_id=event_id, shard=index, no_of_tickets=capacity,
+                              sold_tickets=shard_sold)
+             for index, (capacity, shard_sold) in enumerate(zip(capacities, sold))])
+    event.ticket_shards = shards
+    event.sold_tickets = sold_tickets
+    event.save()
+    bump_catalogue_version()
+    logger.log_info(f"Tickets of event {event_id} spread over {shards} shards")
+
+
+def get_sold_tickets(event):
+    """
+    Function to get the current sold tickets of an event, summed from its shards when sharded
+    :param event: event object
+    :return: number of sold tickets
+    """
+    from core.models import EventTicketShard
+
+    if not event.ticket_shards:
+        return event.sold_tickets
+    return EventTicketShard.objects.filter(event_id=event.id).aggregate(
+        sold_tickets=Sum('sold_tickets'))['sold_tickets'] or 0
+
+
+def reserve_tickets(event_id, no_of_tickets):
+    """
+    Function to sell tickets of an event if enough of them are left
+    :param event_id: id of the event
+    :param no_of_tickets: tickets to sell
+    :return: True if the tickets were reserved
+    """
+    return change_sold_tickets(event_id, no_of_tickets)
+
+
+def release_tickets(event_id, no_of_tickets):
+    """
+    Function to give back sold tickets of an event
+    :param event_id: id of the event
+    :param no_of_tickets: tickets to give back
+    :return: True if the tickets were released
+    """
+    return change_sold_tickets(event_id, -no_of_tickets)
@@ -0,0 +1,114 @@
+"""
+Ticket ledger of the users, one UserEventTicketBalance row per user and event holds the totals
+of the active subscriptions so that they are read with a single lookup instead of being
+summed again from the subscriptions
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, IntegerField, Min, Q, Sum, When
+from django.db.models.functions import Coalesce
+
+from eon_backend.settings.common import LOGGER_SERVICE
+
+logger = LOGGER_SERVICE
+
+
+def record_subscription(subscription):
+    """
+    Function to add a new subscription to the balance of its user for its event, to be called
+    in the transaction inserting the subscription
+    :param subscription: saved subscription object
+    """
+    from core.models import UserEventTicketBalance
+
+    amount = subscription.amount or 0
+    no_of_tickets = int(subscription.no_of_tickets)
+    discount_amount = subscription.discount_amount or 0
+    balances = UserEventTicketBalance.objects.filter(user_id=subscription.user_id,
+                                                     event_id=subscription.event_id)
+    changes = dict(no_of_tickets=F('no_of_tickets') + no_of_tickets,
+                   amount_paid=F('amount_paid') + max(amount, 0),
+                   refunded_amount=F('refunded_amount') + max(-amount, 0),
+                   discount_amount=F('discount_amount') + discount_amount)
+    if balances.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            UserEventTicketBalance.objects.create(
+                user_id=subscription.user_id, event_id=subscription.event_id,
+                no_of_tickets=no_of_tickets, amount_paid=max(amount, 0),
+                refunded_amount=max(-amount, 0), discount_amount=discount_amount,
+                first_purchase_on=subscription.created_on)
+    except IntegrityError:
+        # a concurrent first purchase created the balance meanwhile
+        balances.update(**changes)
+
+
+def get_balance(user_id, event_id, lock=False):
+    """
+    Function to get the balance of a user for an event
+    :param user_id: id of the user
+    :param event_id: id of the event
+    :param lock: lock the balance row until the end of the transaction
+    :return: balance object, None if the user holds no subscription to the event
+    """
+    from core.models import UserEventTicketBalance
+
+    queryset = UserEventTicketBalance.objects.filter(user_id=user_id, event_id=event_id)
+    if lock:
+        queryset = queryset.select_for_update()
+    return queryset.first()
+
+
+def get_balance_rows(subscriptions):
+    """
+    Function to sum active subscriptions per user and event in a single GROUP BY
+    :param subscriptions: subscription queryset
+    :return: values queryset with one row per user and event
+    """
+    return subscriptions.filter(is_active=True).values('user_id', 'event_id').annotate(
+        total_tickets=Sum('no_of_tickets'),
+        total_paid=Coalesce(Sum(Case(When(amount__gt=0, then=F('amount')), default=0,
+                                     output_field=IntegerField())), 0),
+        total_refunded=Coalesce(Sum(Case(When(amount__lt=0, then=-F('amount')), default=0,
+                                         output_field=IntegerField())), 0),
+        total_discount=Coalesce(Sum('discount_amount'), 0),
+        first_purchase=Min('created_on')).order_by()
+
+
+@transaction.atomic()
+def rebuild_ledger(pairs=None, batch_size=1000):
+    """
+    Function to recompute balances from the subscriptions
+    :param pairs: (user_id, event_id) pairs to rebuild, every balance when None
+    :param batch_size: rows inserted per statement
+    :return: number of balances written
+    """
+    from core.models import Subscription, UserEventTicketBalance
+
+    balances = UserEventTicketBalance.objects.all()
+    subscriptions = Subscription.objects.all()
+    if pairs is not None:
+        if not pairs:
+            return 0
+        pair_filter = reduce(or_, (Q(user_id=user_id, event_id=event_id)
+                                   for user_id, event_id in pairs))
+        balances = balances.filter(pair_filter)
+        subscriptions = subscriptions.filter(pair_filter)
+    elif connection.vendor == 'postgresql':
+        # purchases wait for the rebuild and then apply their change on top of it
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {UserEventTicketBalance._meta.db_table} IN EXCLUSIVE MODE")
+    balances.delete()
+    written = UserEventTicketBalance.objects.bulk_create(
+        [UserEventTicketBalance(user_id=row['user_id'], event_id=row['event_id'],
+                                no_of_tickets=int(row['total_tickets']),
+                                amount_paid=row['total_paid'],
+                                refunded_amount=row['total_refunded'],
+                                discount_amount=row['total_discount'],
+                                first_purchase_on=row['first_purchase'])
+         for row in get_balance_rows(subscriptions).iterator()], batch_size=batch_size)
+    logger.log_info(f"{len(written)} ticket balances rebuilt")
+    return len(written)
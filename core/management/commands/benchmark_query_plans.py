@@ -0,0 +1,139 @@
+"""
+Benchmark of the query plans of the soft delete query patterns
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from authentication.models import User
+from core.models import Event, EventType, Invitation, Notification, Subscription, UserInterest, \
+    WishList
+
+INDEXED_MODELS = (Invitation, Notification, Subscription, UserInterest, WishList)
+
+
+class Rollback(Exception):
+    """
+    Raised to drop the seeded data and indexes once the benchmark is over
+    """
+
+
+class Command(BaseCommand):
+    """
+    Seeds a dataset in a transaction, prints the plan and timing of the hot soft delete
+    queries with and without the composite and partial indexes, then rolls everything back
+    """
+    help = "Show the query plans of the soft delete query patterns with and without their indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--events', type=int, default=500)
+        parser.add_argument('--rows', type=int, default=50000,
+                            help="rows seeded in each of the indexed tables")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user_ids, event_ids = self.seed(options['users'], options['events'],
+                                                options['rows'])
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+                queries = self.get_queries(random.choice(user_ids), random.choice(event_ids))
+                self.report("with indexes", queries, options['repeat'])
+                self.drop_indexes()
+                self.report("without indexes", queries, options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Seeded data rolled back")
+
+    def seed(self, users, events, rows):
+        """
+        Function to insert the benchmark dataset, a fifth of the soft deletable rows are inactive
+        :return: ids of the seeded users and events
+        """
+        tag = int(time.time())
+        User.objects.bulk_create(
+            [User(username=f"bench{tag}_{index}@eon.com", email=f"bench{tag}_{index}@eon.com",
+                  password="!") for index in range(users)])
+        user_ids = list(User.objects.filter(
+            email__startswith=f"bench{tag}_").values_list('id', flat=True))
+        event_type = EventType.objects.create(type=f"bench{tag}")
+        Event.objects.bulk_create(
+            [Event(name=f"bench {index}", type=event_type, description="benchmark",
+                   date=date.today() + timedelta(days=index % 60), time="10:00:00",
+                   location="benchmark", subscription_fee=100, no_of_tickets=1000,
+                   event_created_by_id=random.choice(user_ids)) for index in range(events)])
+        event_ids = list(Event.objects.filter(type=event_type).values_list('id', flat=True))
+
+        def pairs():
+            return random.choice(user_ids), random.choice(event_ids), random.random() > 0.2
+
+        Subscription.objects.bulk_create(
+            [Subscription(user_id=user_id, event_id=event_id, no_of_tickets=1, amount=100,
+                          is_active=is_active) for user_id, event_id, is_active in
+             (pairs() for _ in range(rows))])
+        Invitation.objects.bulk_create(
+            [Invitation(user_id=user_id, event_id=event_id, discount_percentage=10,
+                        email="bench@eon.com", is_active=is_active)
+             for user_id, event_id, is_active in (pairs() for _ in range(rows))])
+        Notification.objects.bulk_create(
+            [Notification(user_id=user_id, event_id=event_id, message="benchmark",
+                          has_read=not is_active) for user_id, event_id, is_active in
+             (pairs() for _ in range(rows))])
+        WishList.objects.bulk_create(
+            [WishList(user_id=user_id, event_id=event_id, is_active=is_active)
+             for user_id, event_id, is_active in {pair[:2]: pair for pair in
+                                                  (pairs() for _ in range(rows))}.values()])
+        UserInterest.objects.bulk_create(
+            [UserInterest(user_id=random.choice(user_ids), event_type=event_type,
+                          is_active=random.random() > 0.2) for _ in range(rows)])
+        return user_ids, event_ids
+
+    @staticmethod
+    def get_queries(user_id, event_id):
+        """
+        Function to list the queries of core/views_layer the indexes are made for
+        """
+        return {
+            "subscription of a user to an event": Subscription.objects.filter(
+                user_id=user_id, event_id=event_id, is_active=True),
+            "subscriptions of an event": Subscription.objects.filter(
+                event_id=event_id, is_active=True).values('amount'),
+            "wishlist of a user": WishList.objects.filter(
+                user_id=user_id, is_active=True).values_list('event_id', flat=True),
+            "invitations of an event": Invitation.objects.filter(event_id=event_id, is_active=True),
+            "invitation of a user to an event": Invitation.objects.filter(
+                user_id=user_id, event_id=event_id, is_active=True),
+            "unread notifications of a user": Notification.objects.filter(
+                has_read=False, user_id=user_id).order_by('-created_on'),
+            "interests of a user": UserInterest.objects.filter(
+                user_id=user_id, is_active=True).values_list('event_type', flat=True),
+        }
+
+    def report(self, title, queries, repeat):
+        """
+        Function to print the plan and the mean run time of every query
+        """
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Query plans {title}"))
+        for name, queryset in queries.items():
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(f"{name} ({elapsed:.2f} ms)")
+            self.stdout.write(queryset.explain())
+
+    @staticmethod
+    def drop_indexes():
+        """
+        Function to drop the composite and partial indexes inside the running transaction
+        """
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(str(index.remove_sql(model, schema_editor)))
@@ -0,0 +1,96 @@
+"""
+Benchmark of the ticket inventory under concurrent buyers
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from authentication.models import User
+from core.inventory import get_sold_tickets, reserve_tickets, shard_event_tickets
+from core.models import Event, EventType
+
+
+class Command(BaseCommand):
+    """
+    Lets many threads, each with its own database connection, buy tickets of a single event
+    at once and checks that the event is never oversold. The seeded rows are deleted at the end.
+    """
+    help = "Check that concurrent ticket reservations never oversell an event"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--attempts', type=int, default=100,
+                            help="reservations tried by each thread")
+        parser.add_argument('--tickets', type=int, default=1000,
+                            help="tickets of the event, fewer than the reservations tried")
+        parser.add_argument('--batch', type=int, default=1, help="tickets of each reservation")
+        parser.add_argument('--shards', type=int, default=0,
+                            help="counter shards of the event, 0 to reserve on the event row")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            raise CommandError("SQLite serializes every writer, run the benchmark on PostgreSQL")
+        tag = int(time.time())
+        user = User.objects.create(username=f"bench{tag}@eon.com", email=f"bench{tag}@eon.com",
+                                   password="!")
+        event_type = EventType.objects.create(type=f"bench{tag}")
+        event = Event.objects.create(name="contention bench", type=event_type,
+                                     description="benchmark", date=date.today() + timedelta(days=1),
+                                     time="10:00:00", location="benchmark", subscription_fee=0,
+                                     no_of_tickets=options['tickets'], event_created_by=user)
+        if options['shards']:
+            shard_event_tickets(event.id, options['shards'])
+        try:
+            self.run(event, options)
+        finally:
+            Event.objects.filter(id=event.id).delete()
+            event_type.delete()
+            User.objects.filter(id=user.id).delete()
+
+    def run(self, event, options):
+        """
+        Function to start the buyers together and report the outcome
+        """
+        results = []
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'])
+
+        def buyer():
+            reserved = rejected = 0
+            try:
+                start.wait()
+                for _ in range(options['attempts']):
+                    with transaction.atomic():
+                        if reserve_tickets(event.id, options['batch']):
+                            reserved += 1
+                        else:
+                            rejected += 1
+            finally:
+                connection.close()
+            with lock:
+                results.append((reserved, rejected))
+
+        threads = [threading.Thread(target=buyer) for _ in range(options['threads'])]
+        started_at = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started_at
+
+        reserved = sum(result[0] for result in results)
+        rejected = sum(result[1] for result in results)
+        event.refresh_from_db()
+        sold_tickets = get_sold_tickets(event)
+        oversold = sold_tickets - event.no_of_tickets
+        self.stdout.write(f"{options['threads']} threads, {options['shards']} shards, "
+                          f"{reserved + rejected} reservations "
+                          f"in {elapsed:.2f}s ({(reserved + rejected) / elapsed:.0f}/s)")
+        self.stdout.write(f"reserved {reserved}, rejected {rejected}, sold tickets "
+                          f"{sold_tickets} of {event.no_of_tickets}")
+        if sold_tickets != reserved * options['batch'] or oversold > 0:
+            raise CommandError(f"Inventory is inconsistent, oversold by {oversold}")
+        self.stdout.write(self.style.SUCCESS("No ticket was oversold"))
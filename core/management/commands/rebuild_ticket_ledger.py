@@ -0,0 +1,21 @@
+"""
+Rebuild the ticket ledger of the users from their subscriptions
+"""
+from django.core.management.base import BaseCommand
+
+from core.ledger import rebuild_ledger
+
+
+class Command(BaseCommand):
+    """
+    Recomputes every user ticket balance with a single GROUP BY over the active subscriptions
+    and writes them back in bulk
+    """
+    help = "Rebuild the per user and event ticket balances from the subscriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_ledger(batch_size=options['batch_size'])
+        self.stdout.write(f"{written} ticket balances rebuilt")
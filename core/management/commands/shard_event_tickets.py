@@ -0,0 +1,29 @@
+"""
+Spread the ticket inventory of an event over counter shards
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inventory import shard_event_tickets
+from core.models import Event
+
+
+class Command(BaseCommand):
+    """
+    Splits the tickets of an event over shards before a flash sale, or gathers them back into
+    the event row with --shards 0 once the sale is over
+    """
+    help = "Spread the tickets of an event over counter shards, 0 shards to merge them back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--shards', type=int, default=8)
+
+    def handle(self, *args, **options):
+        if options['shards'] < 0:
+            raise CommandError("Number of shards can not be negative")
+        try:
+            shard_event_tickets(options['event_id'], options['shards'])
+        except Event.DoesNotExist as err:
+            raise CommandError(f"No event exist with id={options['event_id']}") from err
+        self.stdout.write(f"Tickets of event {options['event_id']} spread over "
+                          f"{options['shards']} shards")
@@ -0,0 +1,48 @@
+# Generated by Django 3.0.4 on 2026-10-17 10:12
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+SEARCH_INDEXES = (
+    ("core_event_search_vector_gin", "USING gin (search_vector)"),
+    ("core_event_name_trgm", "USING gin (UPPER(name::text) gin_trgm_ops)"),
+    ("core_event_location_trgm", "USING gin (UPPER(location::text) gin_trgm_ops)"),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Full text and trigram indexes are postgres only, other databases use the in process index
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, definition in SEARCH_INDEXES:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON core_event {definition}")
+    Event = apps.get_model('core', 'Event')
+    Event.objects.update(search_vector=SearchVector('name', weight='A') +
+                         SearchVector('location', weight='B'))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20200502_1201'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.0.4 on 2026-10-17 11:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_popularity(apps, schema_editor):
+    Event = apps.get_model('core', 'Event')
+    Event.objects.exclude(no_of_tickets=0).update(
+        popularity=F('sold_tickets') * 100000 / F('no_of_tickets'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_event_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_popularity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['is_active', 'date', '-popularity'], name='core_event_listing_idx'),
+        ),
+    ]
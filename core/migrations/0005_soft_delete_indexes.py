@@ -0,0 +1,41 @@
+# Generated by Django 3.0.4 on 2026-10-17 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_event_popularity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invitation',
+            index=models.Index(condition=models.Q(is_active=True), fields=['event'], name='core_invite_event_active'),
+        ),
+        migrations.AddIndex(
+            model_name='invitation',
+            index=models.Index(condition=models.Q(is_active=True), fields=['user', 'event'], name='core_invite_user_event_active'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(has_read=False), fields=['user', '-created_on'], name='core_notif_user_unread'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(is_active=True), fields=['user', 'event'], name='core_subscr_user_event_active'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(is_active=True), fields=['event'], name='core_subscr_event_active'),
+        ),
+        migrations.AddIndex(
+            model_name='userinterest',
+            index=models.Index(condition=models.Q(is_active=True), fields=['user'], name='core_interest_user_active'),
+        ),
+        migrations.AddIndex(
+            model_name='wishlist',
+            index=models.Index(condition=models.Q(is_active=True), fields=['user'], name='core_wishlist_user_active'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.0.4 on 2026-10-17 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_userprofile_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='discount_amount',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='reconciled_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.0.4 on 2026-10-17 00:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_subscription_payment_amounts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='ticket_shards',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='EventTicketShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('no_of_tickets', models.PositiveIntegerField()),
+                ('sold_tickets', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_shards_set', to='core.Event')),
+            ],
+            options={
+                'unique_together': {('event', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.0.4 on 2026-10-17 00:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0008_event_ticket_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketHold',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True, verbose_name='Date Range Filter')),
+                ('no_of_tickets', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('confirmed', 'confirmed'), ('failed', 'failed'), ('expired', 'expired')], default='pending', max_length=16)),
+                ('expires_on', models.DateTimeField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='core.Event')),
+                ('subscription', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.Subscription')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tickethold',
+            index=models.Index(condition=models.Q(status='pending'), fields=['expires_on'], name='core_hold_pending_expiry'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.0.4 on 2026-10-17 00:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, IntegerField, Min, Sum, When
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def populate_balances(apps, schema_editor):
+    Subscription = apps.get_model('core', 'Subscription')
+    UserEventTicketBalance = apps.get_model('core', 'UserEventTicketBalance')
+    rows = Subscription.objects.filter(is_active=True).values('user_id', 'event_id').annotate(
+        total_tickets=Sum('no_of_tickets'),
+        total_paid=Coalesce(Sum(Case(When(amount__gt=0, then=F('amount')), default=0,
+                                     output_field=IntegerField())), 0),
+        total_refunded=Coalesce(Sum(Case(When(amount__lt=0, then=-F('amount')), default=0,
+                                         output_field=IntegerField())), 0),
+        total_discount=Coalesce(Sum('discount_amount'), 0),
+        first_purchase=Min('created_on')).order_by()
+    UserEventTicketBalance.objects.bulk_create(
+        [UserEventTicketBalance(user_id=row['user_id'], event_id=row['event_id'],
+                                no_of_tickets=int(row['total_tickets']), amount_paid=row['total_paid'],
+                                refunded_amount=row['total_refunded'],
+                                discount_amount=row['total_discount'],
+                                first_purchase_on=row['first_purchase'])
+         for row in rows.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0010_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEventTicketBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('no_of_tickets', models.IntegerField(default=0)),
+                ('amount_paid', models.IntegerField(default=0)),
+                ('refunded_amount', models.IntegerField(default=0)),
+                ('discount_amount', models.IntegerField(default=0)),
+                ('first_purchase_on', models.DateTimeField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='core.Event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'event')},
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.4 on 2026-10-17 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_event_ticket_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tickethold',
+            name='amount',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tickethold',
+            name='discount_amount',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tickethold',
+            name='id_payment',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tickethold',
+            name='id_refund',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.0.4 on 2026-10-17 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_idempotency_key_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='last_reconcile_attempt',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('id_payment__isnull', False), ('reconciled_on__isnull', True)), fields=['last_reconcile_attempt'], name='core_subscr_reconcile_pending'),
+        ),
+    ]
@@ -1,10 +1,16 @@
 """
 Creating all models related to core here
 """
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Case, F, IntegerField, Q, Value, When
 
 # Create your models here.
 from authentication.models import ModelBase, User, Role, ActiveModel
+from core.exceptions import TicketsUnavailable
+from core.inventory import change_sold_tickets
+from core.ledger import record_subscription
+from utils.constants import TICKET_HOLD_STATUS
 
 
 class EventType(ActiveModel):
@@ -15,6 +21,20 @@ class EventType(ActiveModel):
         return self.type
 
 
+POPULARITY_SCALE = 100000
+
+
+def popularity_expression(sold_tickets):
+    """
+    SQL expression for the popularity score of an event, the sold share of its tickets
+    :param sold_tickets: expression giving the number of sold tickets
+    :return: expression usable in annotate or update
+    """
+    return Case(When(no_of_tickets=0, then=Value(0)),
+                default=sold_tickets * POPULARITY_SCALE / F('no_of_tickets'),
+                output_field=IntegerField())
+
+
 class Event(ActiveModel):
     """
     Event model added here
@@ -32,17 +52,76 @@ class Event(ActiveModel):
     is_cancelled = models.BooleanField(default=False)
     external_links = models.CharField(max_length=1024, null=True, blank=True)
     event_created_by = models.ForeignKey(User, on_delete=models.DO_NOTHING)
+    search_vector = SearchVectorField(null=True, editable=False)
+    popularity = models.PositiveIntegerField(default=0, editable=False)
+    # number of EventTicketShard rows holding the inventory, 0 when sold_tickets is the counter
+    ticket_shards = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         """
         To override the database table name, use the db_table parameter in class Meta.
         """
         unique_together = ("name", "type", "date", "time")
+        indexes = [
+            models.Index(fields=["is_active", "date", "-popularity"],
+                         name="core_event_listing_idx"),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # name and location the search index holds for the event, None when not known
+        self.indexed_values = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remembers the name and location the event was loaded with, they are in the search index
+        """
+        instance = super().from_db(db, field_names, values)
+        if 'name' in field_names and 'location' in field_names:
+            instance.indexed_values = (instance.name, instance.location)
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save method for event model, keeps the popularity score in step with the tickets, for a
+        stored event it is computed from the sold tickets of the row, not the loaded value
+        """
+        if self._state.adding:
+            self.popularity = self.sold_tickets * POPULARITY_SCALE // self.no_of_tickets \
+                if self.no_of_tickets else 0
+            super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'no_of_tickets', 'sold_tickets'} & set(update_fields):
+            Event.objects.filter(id=self.id).update(
+                popularity=popularity_expression(F('sold_tickets')))
 
     def __str__(self):
         return "{}".format(self.name)
 
 
+class EventTicketShard(models.Model):
+    """
+    Slice of the inventory of an event, the reservations of a sharded event are spread over
+    its shards so that buyers do not all wait on the lock of the event row
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="ticket_shards_set")
+    shard = models.PositiveSmallIntegerField()
+    no_of_tickets = models.PositiveIntegerField()
+    sold_tickets = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        """
+        To override the database table name, use the db_table parameter in class Meta.
+        """
+        unique_together = ("event", "shard")
+
+    def __str__(self):
+        return "{}-{}".format(self.event_id, self.shard)
+
+
 class Invitation(ActiveModel):
     """
     Invitation model created here
@@ -52,6 +131,17 @@ class Invitation(ActiveModel):
     discount_percentage = models.PositiveIntegerField()
     email = models.EmailField()
 
+    class Meta:
+        """
+        To override the database table name, use the db_table parameter in class Meta.
+        """
+        indexes = [
+            models.Index(fields=["event"], condition=Q(is_active=True),
+                         name="core_invite_event_active"),
+            models.Index(fields=["user", "event"], condition=Q(is_active=True),
+                         name="core_invite_user_event_active"),
+        ]
+
     def __str__(self):
         return "{}-{}-{}".format(self.event, self.user, self.discount_percentage)
 
@@ -68,6 +158,10 @@ class WishList(ActiveModel):
         To override the database table name, use the db_table parameter in class Meta.
         """
         unique_together = ("event", "user")
+        indexes = [
+            models.Index(fields=["user"], condition=Q(is_active=True),
+                         name="core_wishlist_user_active"),
+        ]
 
     def __str__(self):
         return "{}-{}-{}".format(self.user, self.event, self.is_active)
@@ -81,20 +175,122 @@ class Subscription(ActiveModel):
     event = models.ForeignKey(Event, on_delete=models.DO_NOTHING)
     no_of_tickets = models.FloatField()
     id_payment = models.PositiveIntegerField(null=True, blank=True)
+    # amounts returned by the payment service, negative for refunds
     amount = models.IntegerField(null=True, blank=True)
+    discount_amount = models.IntegerField(null=True, blank=True)
+    reconciled_on = models.DateTimeField(null=True, blank=True)
+    last_reconcile_attempt = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        To override the database table name, use the db_table parameter in class Meta.
+        """
+        indexes = [
+            models.Index(fields=["user", "event"], condition=Q(is_active=True),
+                         name="core_subscr_user_event_active"),
+            models.Index(fields=["event"], condition=Q(is_active=True),
+                         name="core_subscr_event_active"),
+            models.Index(fields=["last_reconcile_attempt"],
+                         condition=Q(id_payment__isnull=False, reconciled_on__isnull=True),
+                         name="core_subscr_reconcile_pending"),
+        ]
 
     def save(self, *args, **kwargs):
         """
-        Save method for subscription model
+        Save method for subscription model, reserves the tickets of a new subscription
+        unless tickets_reserved is passed because a ticket hold already took them, and adds
+        it to the ticket balance of the user
         """
-        self.event.sold_tickets += self.no_of_tickets
-        self.event.save()
+        tickets_reserved = kwargs.pop('tickets_reserved', False)
+        adding = self._state.adding
+        if adding and not tickets_reserved and \
+                not change_sold_tickets(self.event_id, self.no_of_tickets):
+            raise TicketsUnavailable()
         super().save(*args, **kwargs)
+        if adding:
+            record_subscription(self)
 
     def __str__(self):
         return "{}-{}-{}".format(self.user, self.event, self.no_of_tickets)
 
 
+class UserEventTicketBalance(models.Model):
+    """
+    Running totals of the active subscriptions of a user to an event, kept up to date in the
+    transaction of every subscription insert
+    """
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING)
+    event = models.ForeignKey(Event, on_delete=models.DO_NOTHING)
+    no_of_tickets = models.IntegerField(default=0)
+    amount_paid = models.IntegerField(default=0)
+    refunded_amount = models.IntegerField(default=0)
+    discount_amount = models.IntegerField(default=0)
+    first_purchase_on = models.DateTimeField()
+
+    class Meta:
+        """
+        To override the database table name, use the db_table parameter in class Meta.
+        """
+        unique_together = ("user", "event")
+
+    def __str__(self):
+        return "{}-{}-{}".format(self.user_id, self.event_id, self.no_of_tickets)
+
+
+class TicketHold(ModelBase):
+    """
+    Tickets of an event kept aside for a user while its purchase is paid and confirmed
+    """
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING)
+    event = models.ForeignKey(Event, on_delete=models.DO_NOTHING)
+    no_of_tickets = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, default=TICKET_HOLD_STATUS['pending'],
+                              choices=[(status, status) for status in TICKET_HOLD_STATUS.values()])
+    expires_on = models.DateTimeField()
+    subscription = models.OneToOneField(Subscription, on_delete=models.SET_NULL, null=True,
+                                        blank=True)
+    # payment taken for the hold, recorded before it is confirmed so that it is never taken twice
+    id_payment = models.PositiveIntegerField(null=True, blank=True)
+    amount = models.IntegerField(null=True, blank=True)
+    discount_amount = models.IntegerField(null=True, blank=True)
+    id_refund = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        """
+        To override the database table name, use the db_table parameter in class Meta.
+        """
+        indexes = [
+            models.Index(fields=["expires_on"], condition=Q(status=TICKET_HOLD_STATUS['pending']),
+                         name="core_hold_pending_expiry"),
+        ]
+
+    def __str__(self):
+        return "{}-{}-{}".format(self.user_id, self.event_id, self.status)
+
+
+class IdempotencyKey(ModelBase):
+    """
+    Response of a purchase request stored under the Idempotency-Key sent by the client,
+    status_code stays empty while the first request with the key is being processed, which
+    holds the key until locked_until
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.TextField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        To override the database table name, use the db_table parameter in class Meta.
+        """
+        unique_together = ("user", "key")
+
+    def __str__(self):
+        return "{}-{}".format(self.user_id, self.key)
+
+
 class UserInterest(ActiveModel):
     """
     User interest model created here
@@ -102,6 +298,15 @@ class UserInterest(ActiveModel):
     event_type = models.ForeignKey(EventType, on_delete=models.DO_NOTHING)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        """
+        To override the database table name, use the db_table parameter in class Meta.
+        """
+        indexes = [
+            models.Index(fields=["user"], condition=Q(is_active=True),
+                         name="core_interest_user_active"),
+        ]
+
     def __str__(self):
         return "{}-{}".format(self.user, self.event_type)
 
@@ -116,6 +321,33 @@ class UserProfile(ModelBase):
     organization = models.CharField(max_length=250, null=True, blank=True)
     address = models.CharField(max_length=250, null=True, blank=True)
     role = models.ForeignKey(Role, on_delete=models.DO_NOTHING, default=1)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # role the profile was loaded with, None when it was not loaded
+        self._loaded_role_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remembers the role the profile was loaded with, unless the role was deferred
+        """
+        instance = super().from_db(db, field_names, values)
+        if 'role_id' in field_names:
+            instance._loaded_role_id = instance.role_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save method for user profile, a change of role revokes the tokens issued with the old one
+        """
+        if not self._state.adding and self._loaded_role_id is not None and \
+                self.role_id != self._loaded_role_id:
+            self.token_version += 1
+        super().save(*args, **kwargs)
+        if 'role_id' not in self.get_deferred_fields():
+            self._loaded_role_id = self.role_id
 
     def __str__(self):
         return "{}-{}-{}".format(self.user, self.name, self.contact_number)
@@ -130,6 +362,15 @@ class Notification(ModelBase):
     message = models.CharField(max_length=512)
     has_read = models.BooleanField(default=False)
 
+    class Meta:
+        """
+        To override the database table name, use the db_table parameter in class Meta.
+        """
+        indexes = [
+            models.Index(fields=["user", "-created_on"], condition=Q(has_read=False),
+                         name="core_notif_user_unread"),
+        ]
+
     def __str__(self):
         return "{}-{}-{}".format(self.user, self.event, self.message)
 
@@ -7,8 +7,8 @@ import secrets
 
 from rest_framework import status
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from authentication.backends import RoleClaimJWTAuthentication
 from core.models import Event
 from eon_backend.settings.common import LOGGER_SERVICE, BUCKET, BUCKET_PATH
 from utils.common import api_success_response, api_error_response
@@ -21,7 +21,7 @@ class PresignedUrl(APIView):
     """
     Api for presigned url created here
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [RoleClaimJWTAuthentication]
 
     def get(self, request):
         """
@@ -0,0 +1,192 @@
+"""
+Search backends for the event search are here.
+Postgres uses a weighted tsvector column and trigram indexes, any other database (the
+sqlite test runs) falls back to an in process inverted index.
+"""
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Coalesce
+
+EVENT_SEARCH_VECTOR = SearchVector('name', weight='A') + SearchVector('location', weight='B')
+EVENT_SEARCH_FIELDS = frozenset(('name', 'location'))
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Function to split a text in lower case search terms
+    :param text: text to split
+    :return: list of terms
+    """
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+class InvertedIndex:
+    """
+    In process inverted index of event name and location, used when the database has no
+    full text search support. The terms are also kept sorted so that the terms starting with
+    a query term are found by bisection.
+    """
+    field_weights = (('name', 2.0), ('location', 1.0))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)
+        self._terms = []
+        self._documents = {}
+        self._loaded = False
+
+    def _add(self, doc_id, fields):
+        self._remove(doc_id)
+        terms = {}
+        for field, weight in self.field_weights:
+            for term in tokenize(fields.get(field)):
+                terms[term] = max(terms.get(term, 0), weight)
+        for term, weight in terms.items():
+            if term not in self._postings:
+                insort(self._terms, term)
+            self._postings[term][doc_id] = weight
+        self._documents[doc_id] = terms
+
+    def _remove(self, doc_id):
+        for term in self._documents.pop(doc_id, {}):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _load(self):
+        from core.models import Event
+        rows = Event.objects.values_list('id', 'name', 'location').iterator()
+        for doc_id, name, location in rows:
+            if doc_id not in self._documents:
+                self._add(doc_id, {'name': name, 'location': location})
+        self._loaded = True
+
+    def add(self, doc_id, **fields):
+        """
+        Function to index or re-index a document
+        """
+        with self._lock:
+            self._add(doc_id, fields)
+
+    def remove(self, doc_id):
+        """
+        Function to drop a document from the index
+        """
+        with self._lock:
+            self._remove(doc_id)
+
+    def clear(self):
+        """
+        Function to drop the whole index, it is rebuilt on the next search
+        """
+        with self._lock:
+            self._postings.clear()
+            self._terms.clear()
+            self._documents.clear()
+            self._loaded = False
+
+    def search(self, text):
+        """
+        Function to find the documents having, for every query term, a term which starts with it
+        :param text: search text
+        :return: dict of document id and its relevance score
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            scores = None
+            for query_term in set(tokenize(text)):
+                term_scores = defaultdict(float)
+                index = bisect_left(self._terms, query_term)
+                while index < len(self._terms) and self._terms[index].startswith(query_term):
+                    for doc_id, weight in self._postings[self._terms[index]].items():
+                        term_scores[doc_id] += weight
+                    index += 1
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc_id: score + term_scores[doc_id]
+                              for doc_id, score in scores.items() if doc_id in term_scores}
+                if not scores:
+                    break
+            return dict(scores or {})
+
+
+event_index = InvertedIndex()
+
+
+def is_postgres():
+    """
+    :return: True if the default database supports postgres full text search
+    """
+    return connection.vendor == 'postgresql'
+
+
+def index_event(event, created=False, update_fields=None):
+    """
+    Function to keep the search index in sync with a saved event, an event saved without a
+    change of its name or location is not indexed again. The in process index is only
+    changed once the transaction commits.
+    :param event: event object
+    :param created: True if the event was inserted
+    :param update_fields: fields saved, None when every field was saved
+    """
+    from core.models import Event
+    if not created:
+        if update_fields is not None and not EVENT_SEARCH_FIELDS.intersection(update_fields):
+            return
+        if (event.name, event.location) == event.indexed_values:
+            return
+    event.indexed_values = (event.name, event.location)
+    if is_postgres():
+        Event.objects.filter(id=event.id).update(search_vector=EVENT_SEARCH_VECTOR)
+    else:
+        doc_id, (name, location) = event.id, event.indexed_values
+        transaction.on_commit(lambda: event_index.add(doc_id, name=name, location=location))
+
+
+def unindex_event(event):
+    """
+    Function to drop a deleted event from the in process index once the transaction commits,
+    the search vector of postgres is deleted with its row
+    :param event: event object
+    """
+    if not is_postgres():
+        doc_id = event.id
+        transaction.on_commit(lambda: event_index.remove(doc_id))
+
+
+def search_events(queryset, search_text):
+    """
+    Function to filter an event queryset by the search text, the matching events are
+    annotated with their relevance as search_rank. Both backends match the events having every
+    search term as a prefix of a word of their name or location, or the whole text within them.
+    :param queryset: event queryset
+    :param search_text: text searched in the name and location of events
+    :return: filtered and annotated queryset
+    """
+    if not tokenize(search_text):
+        return queryset.none()
+    substring_match = Q(name__icontains=search_text) | Q(location__icontains=search_text)
+    if is_postgres():
+        terms = tokenize(search_text)
+        query = SearchQuery(" & ".join(f"{term}:*" for term in terms), search_type='raw')
+        return queryset.filter(Q(search_vector=query) | substring_match).annotate(
+            search_rank=Coalesce(
+                SearchRank(F('search_vector'), query) + TrigramSimilarity('name', search_text),
+                Value(0.0), output_field=FloatField()))
+
+    scores = event_index.search(search_text)
+    return queryset.filter(Q(id__in=scores) | substring_match).annotate(search_rank=Case(
+        *[When(id=doc_id, then=Value(score)) for doc_id, score in scores.items()],
+        default=Value(0.0), output_field=FloatField()))
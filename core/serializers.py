@@ -41,7 +41,17 @@ class EventSerializer(serializers.ModelSerializer):
         To override the database table name, use the db_table parameter in class Meta.
         """
         model = Event
-        exclude = ('created_on', 'updated_on')
+        exclude = ('created_on', 'updated_on', 'search_vector', 'popularity', 'ticket_shards')
+        read_only_fields = ('sold_tickets',)
+
+    def update(self, instance, validated_data):
+        """
+        Saves only the changed fields, the sold tickets are kept as the reservations left them
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_on'])
+        return instance
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -58,6 +68,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                   'event',
                   'no_of_tickets',
                   'amount',
+                  'discount_amount',
                   'id_payment')
 
 
@@ -65,8 +76,10 @@ class SubscriptionListSerializer(serializers.ModelSerializer):
     """
     Serializer class for  subscription list
     """
+    user_id = serializers.IntegerField()
     name = serializers.CharField()
     email = serializers.EmailField()
+    no_of_tickets = serializers.IntegerField()
     paid_amount = serializers.IntegerField()
 
     class Meta:
@@ -74,7 +87,8 @@ class SubscriptionListSerializer(serializers.ModelSerializer):
         To override the database table name, use the db_table parameter in class Meta.
         """
         model = Subscription
-        fields = ('name',
+        fields = ('user_id',
+                  'name',
                   'email',
                   'no_of_tickets',
                   'paid_amount')
@@ -119,7 +133,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
         """
         model = UserProfile
-        fields = "__all__"
+        exclude = ("token_version",)
 
 
 class WishListSerializer(serializers.ModelSerializer):
@@ -0,0 +1,41 @@
+"""
+Signal handlers of the core app are here, they are connected in CoreConfig.ready
+"""
+from core.catalogue import bump_catalogue_version, invalidate_user_event_flags
+from core.search import index_event, unindex_event
+from utils.roles import invalidate_user_profile
+
+
+def update_event_search_index(sender, **kwargs):
+    """
+    Keeps the event search index in sync whenever an event is saved
+    """
+    index_event(kwargs.get('instance'), kwargs.get('created', False), kwargs.get('update_fields'))
+
+
+def remove_event_search_index(sender, **kwargs):
+    """
+    Drops a deleted event from the event search index
+    """
+    unindex_event(kwargs.get('instance'))
+
+
+def invalidate_event_catalogue(sender, **kwargs):
+    """
+    Drops the cached event catalogue whenever an event or the feedback count changes
+    """
+    bump_catalogue_version()
+
+
+def invalidate_event_flags(sender, **kwargs):
+    """
+    Drops the cached event flags of the user whose subscription, wishlist or feedback changed
+    """
+    invalidate_user_event_flags(kwargs.get('instance').user_id)
+
+
+def invalidate_user_role(sender, **kwargs):
+    """
+    Drops the cached profile and role of the user whose profile changed
+    """
+    invalidate_user_profile(kwargs.get('instance').user_id)
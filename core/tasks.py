@@ -0,0 +1,146 @@
+"""
+Celery tasks of the core app are here
+"""
+from datetime import date
+from itertools import groupby
+
+from celery import shared_task
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core.catalogue import bump_catalogue_version
+from core.holds import confirm_paid_hold, release_expired_holds
+from core.idempotency import purge_idempotency_keys
+from core.ledger import rebuild_ledger
+from core.models import Event, EventTicketShard, Subscription, popularity_expression
+from eon_backend.settings.common import LOGGER_SERVICE
+from utils.payment import PaymentServiceError, payment_client
+
+logger = LOGGER_SERVICE
+
+
+@shared_task
+def expire_past_events():
+    """
+    Periodic task to mark the events whose date has passed as inactive, the active past
+    events are found through the (is_active, date) index of the listing
+    :return: number of events expired
+    """
+    expired_events = Event.objects.filter(date__lt=date.today(), is_active=True).update(
+        is_active=False, updated_on=timezone.now())
+    if expired_events:
+        bump_catalogue_version()
+    logger.log_info(f"{expired_events} past events marked inactive")
+    return expired_events
+
+
+@shared_task
+def reconcile_subscription_payments(batch_size=500):
+    """
+    Periodic task to verify the amounts stored on the paid subscriptions against the payment
+    service. The payments of a user are fetched in a single call, the stored amounts and the
+    ticket balances are corrected when they differ and the subscriptions are marked as reconciled.
+    Every attempt is recorded and the least recently attempted subscriptions go first, so the
+    ones that can not be reconciled yet do not hold back the rest of the table.
+    :param batch_size: largest number of subscriptions verified in one run
+    :return: number of subscriptions reconciled
+    """
+    subscriptions = list(Subscription.objects.filter(
+        id_payment__isnull=False, reconciled_on__isnull=True
+    ).only('id', 'user_id', 'event_id', 'id_payment', 'amount', 'discount_amount',
+           'updated_on').order_by(F('last_reconcile_attempt').asc(nulls_first=True),
+                                  'id')[:batch_size])
+    Subscription.objects.filter(id__in=[_.id for _ in subscriptions]).update(
+        last_reconcile_attempt=timezone.now())
+    subscriptions.sort(key=lambda _: _.user_id)
+    reconciled = []
+    corrected_balances = set()
+    for user_id, user_subscriptions in groupby(subscriptions, key=lambda _: _.user_id):
+        user_subscriptions = list(user_subscriptions)
+        try:
+            payments = payment_client.get_payments(
+                user_id, [_.id_payment for _ in user_subscriptions])
+        except PaymentServiceError as err:
+            logger.log_error(f"Reconciliation skipped for user_id {user_id}: {err}")
+            continue
+        payments = {payment['id']: payment for payment in payments}
+        for subscription in user_subscriptions:
+            payment = payments.get(subscription.id_payment)
+            if payment is None:
+                logger.log_error(f"Payment {subscription.id_payment} of subscription "
+                                 f"{subscription.id} is unknown to the payment service")
+                continue
+            sign = -1 if payment['status'] == 3 else 1
+            amount = payment['total_amount'] * sign
+            discount_amount = payment['discount_amount'] * sign
+            if (subscription.amount, subscription.discount_amount) != (amount, discount_amount):
+                logger.log_error(f"Subscription {subscription.id} amounts corrected from "
+                                 f"{subscription.amount}/{subscription.discount_amount} "
+                                 f"to {amount}/{discount_amount}")
+                # a changed updated_on invalidates the cached event details of the subscriber
+                subscription.updated_on = timezone.now()
+                corrected_balances.add((subscription.user_id, subscription.event_id))
+            subscription.amount = amount
+            subscription.discount_amount = discount_amount
+            subscription.reconciled_on = timezone.now()
+            reconciled.append(subscription)
+    with transaction.atomic():
+        Subscription.objects.bulk_update(reconciled, ['amount', 'discount_amount', 'reconciled_on',
+                                                      'updated_on'])
+        rebuild_ledger(corrected_balances)
+    logger.log_info(f"{len(reconciled)} subscription payments reconciled")
+    return len(reconciled)
+
+
+@shared_task
+def sync_sharded_sold_tickets():
+    """
+    Periodic task to copy the sold tickets of the sharded events, summed over their shards in a
+    single GROUP BY, to the event rows read by the listings. Like the other purchases it leaves
+    the cached catalogue to expire on its own.
+    :return: number of events updated
+    """
+    shard_totals = EventTicketShard.objects.values('event_id').annotate(
+        total_sold_tickets=Sum('sold_tickets')).values_list('event_id', 'total_sold_tickets')
+    updated_events = 0
+    for event_id, total_sold_tickets in shard_totals:
+        updated_events += Event.objects.filter(id=event_id).exclude(
+            sold_tickets=total_sold_tickets).update(
+            sold_tickets=total_sold_tickets, popularity=popularity_expression(total_sold_tickets),
+            updated_on=timezone.now())
+    logger.log_info(f"Sold tickets of {updated_events} sharded events synced")
+    return updated_events
+
+
+@shared_task
+def process_ticket_hold(hold_id):
+    """
+    Task to confirm a ticket hold whose payment was taken in the request. It only carries the
+    hold id, and a redelivered task finds the hold already confirmed.
+    :param hold_id: id of the hold
+    :return: final status of the hold
+    """
+    return confirm_paid_hold(hold_id)
+
+
+@shared_task
+def release_expired_ticket_holds():
+    """
+    Periodic task to give back the tickets of the holds whose payment did not finish in time
+    :return: number of holds expired
+    """
+    expired_holds = release_expired_holds()
+    logger.log_info(f"{expired_holds} expired ticket holds released")
+    return expired_holds
+
+
+@shared_task
+def purge_expired_idempotency_keys():
+    """
+    Periodic task to delete the idempotency keys past their time to live
+    :return: number of keys deleted
+    """
+    deleted_keys = purge_idempotency_keys()
+    logger.log_info(f"{deleted_keys} expired idempotency keys deleted")
+    return deleted_keys
@@ -2,11 +2,37 @@
 Event related test cases are added here
 """
 import json
+from datetime import date, timedelta
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 
 from authentication.models import Role, User
-from core.models import Event, EventType, UserProfile
+from core.inventory import reserve_tickets, shard_event_tickets
+from core.models import Event, EventType, UserProfile, Subscription, WishList
+from core.search import event_index
+from core.tasks import expire_past_events
+
+
+def run_on_commit_callbacks():
+    """
+    Runs the callbacks waiting for the commit of the test transaction, such as the cache
+    invalidations, as if it had been committed
+    """
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
+
+
+def response_json(response):
+    """
+    Returns the json body of a response, a streamed response is read to its end
+    """
+    if response.streaming:
+        return json.loads(b"".join(response.streaming_content))
+    return json.loads(response.content)
 
 
 class EventAPITest(APITestCase):
@@ -18,6 +44,8 @@ class EventAPITest(APITestCase):
         """
         Data setup for Event Unit test cases
         """
+        cache.clear()
+        event_index.clear()
 
         role = Role(role="organizer")
         role.save()
@@ -233,6 +261,28 @@ class EventAPITest(APITestCase):
         # Check
         self.assertEqual(response.status_code, 200)
 
+    def test_event_patch_api_keeps_sold_tickets(self):
+        """
+        Unit test for event update api, the sold tickets can not be overwritten by an update
+        and the popularity follows the new number of tickets
+        """
+        # Setup
+        Event.objects.filter(id=self.event.id).update(sold_tickets=50)
+        data = {"sold_tickets": 0, "no_of_tickets": 200, "testing": True}
+
+        # Run
+        response = self.client.patch("/core/event/{event_id}/".format(event_id=self.event.id),
+                                     json.dumps(data),
+                                     HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                     content_type="application/json")
+
+        # Check
+        self.event.refresh_from_db()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.event.no_of_tickets, 200)
+        self.assertEqual(self.event.sold_tickets, 50)
+        self.assertEqual(self.event.popularity, 25000)
+
     def test_event_retrieve_api_with_invalid_event_id(self):
         """
         Unit test for event get api with invalid event id
@@ -489,3 +539,410 @@ class EventAPITest(APITestCase):
                                     content_type="application/json")
 
         self.assertEqual(response.status_code, 200)
+
+    def test_event_get_api_query_count_independent_of_list_size(self):
+        """
+        Unit test for event get api running a constant number of queries for any list size
+        """
+        # Setup
+        upcoming_date = date.today() + timedelta(days=10)
+
+        def add_events(count):
+            for index in range(count):
+                event = Event.objects.create(name="event {}".format(Event.objects.count()),
+                                             type=self.event_type, description="New Event",
+                                             date=upcoming_date, time="12:38:00", location="karnal",
+                                             subscription_fee=0, no_of_tickets=250,
+                                             event_created_by_id=self.user_id)
+                WishList.objects.create(user_id=self.user_id2, event=event)
+                if index % 2:
+                    Subscription.objects.create(user_id=self.user_id2, event=event, no_of_tickets=1)
+
+        def fetch_events():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get("/core/event/",
+                                           HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                           content_type="application/json")
+                events = response_json(response)['data']
+            return response, events, len(context.captured_queries)
+
+        # Run
+        fetch_events()  # warms the cached role
+        add_events(1)
+        run_on_commit_callbacks()
+        response, _, small_list_queries = fetch_events()
+        add_events(4)
+        run_on_commit_callbacks()
+        response, events, large_list_queries = fetch_events()
+
+        # Check
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(events), 5)
+        self.assertEqual(small_list_queries, large_list_queries)
+        self.assertTrue(all(event['is_wishlisted'] for event in events))
+        self.assertEqual(sum(event['is_subscribed'] for event in events), 2)
+
+    def test_event_get_api_with_cursor_pagination(self):
+        """
+        Unit test for event get api paginated with limit and cursor
+        """
+        # Setup
+        upcoming_date = date.today() + timedelta(days=10)
+        for index, sold_tickets in enumerate([10, 50, 50]):
+            Event.objects.create(name="paginated {}".format(index), type=self.event_type,
+                                 description="New Event", date=upcoming_date, time="12:38:00",
+                                 location="karnal", subscription_fee=0, no_of_tickets=100,
+                                 sold_tickets=sold_tickets, event_created_by_id=self.user_id)
+
+        # Run
+        first_page = self.client.get("/core/event/?limit=2",
+                                     HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                     content_type="application/json")
+        next_cursor = first_page.data['data']['next_cursor']
+        second_page = self.client.get("/core/event/", {'limit': 2, 'cursor': next_cursor},
+                                      HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                      content_type="application/json")
+        invalid_cursor = self.client.get("/core/event/?limit=2&cursor=invalid",
+                                         HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                         content_type="application/json")
+
+        # Check
+        self.assertEqual(first_page.status_code, 200)
+        self.assertEqual([event['name'] for event in first_page.data['data']['event_list']],
+                         ["paginated 2", "paginated 1"])
+        self.assertEqual([event['name'] for event in second_page.data['data']['event_list']],
+                         ["paginated 0"])
+        self.assertIsNone(second_page.data['data']['next_cursor'])
+        self.assertEqual(invalid_cursor.status_code, 400)
+
+    def test_event_get_api_does_not_expire_past_events(self):
+        """
+        Unit test for event get api leaving the expiry of past events to the periodic task
+        """
+        # Run
+        response = self.client.get("/core/event/",
+                                   HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                   content_type="application/json")
+
+        # Check
+        self.assertEqual(response.status_code, 200)
+        self.event.refresh_from_db()
+        self.assertTrue(self.event.is_active)
+
+    def test_expire_past_events_task(self):
+        """
+        Unit test for periodic task marking past events inactive only once, including the
+        events moved into the past after a run
+        """
+        # Setup
+        upcoming_event = Event.objects.create(name="upcoming", type=self.event_type,
+                                              description="New Event",
+                                              date=date.today() + timedelta(days=1),
+                                              time="12:38:00", location="karnal",
+                                              subscription_fee=0, no_of_tickets=100,
+                                              event_created_by_id=self.user_id)
+
+        # Run
+        first_run = expire_past_events()
+        second_run = expire_past_events()
+        Event.objects.filter(id=upcoming_event.id).update(date="2020-04-01")
+        redated_run = expire_past_events()
+
+        # Check
+        self.assertEqual(first_run, 1)
+        self.assertEqual(second_run, 0)
+        self.assertEqual(redated_run, 1)
+        self.event.refresh_from_db()
+        upcoming_event.refresh_from_db()
+        self.assertFalse(self.event.is_active)
+        self.assertFalse(upcoming_event.is_active)
+
+    def test_event_get_api_for_text_search_ranked_by_relevance(self):
+        """
+        Unit test for event get api returning searched events ranked by relevance
+        """
+        # Setup
+        upcoming_date = date.today() + timedelta(days=10)
+        Event.objects.create(name="Food fair", type=self.event_type, description="New Event",
+                             date=upcoming_date, time="12:38:00", location="Music hall",
+                             subscription_fee=0, no_of_tickets=100, sold_tickets=90,
+                             event_created_by_id=self.user_id)
+        Event.objects.create(name="Music night", type=self.event_type, description="New Event",
+                             date=upcoming_date, time="12:38:00", location="Pune",
+                             subscription_fee=0, no_of_tickets=100, sold_tickets=10,
+                             event_created_by_id=self.user_id)
+        Event.objects.create(name="Dance show", type=self.event_type, description="New Event",
+                             date=upcoming_date, time="12:38:00", location="Delhi",
+                             subscription_fee=0, no_of_tickets=100,
+                             event_created_by_id=self.user_id)
+
+        # Run
+        response = self.client.get("/core/event/?search=music",
+                                   HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                   content_type="application/json")
+
+        # Check
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event['name'] for event in response_json(response)['data']],
+                         ["Music night", "Food fair"])
+
+    def test_event_get_api_for_text_search_matches_every_term_or_substring(self):
+        """
+        Unit test for event get api matching events having every search term as a word prefix,
+        or the search text within their name or location
+        """
+        # Setup
+        upcoming_date = date.today() + timedelta(days=10)
+        for name, location in (("Music night", "Pune"), ("Music fest", "Delhi")):
+            Event.objects.create(name=name, type=self.event_type, description="New Event",
+                                 date=upcoming_date, time="12:38:00", location=location,
+                                 subscription_fee=0, no_of_tickets=100,
+                                 event_created_by_id=self.user_id)
+
+        def search(text):
+            response = self.client.get("/core/event/?search={}".format(text),
+                                       HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                       content_type="application/json")
+            return [event['name'] for event in response_json(response)['data']]
+
+        # Run
+        every_term = search("mus pun")
+        substring = search("elhi")
+
+        # Check
+        self.assertEqual(every_term, ["Music night"])
+        self.assertEqual(substring, ["Music fest"])
+
+    def test_event_search_index_follows_saves_and_deletes(self):
+        """
+        Unit test for the in process search index matching term prefixes, skipping the saves
+        which keep the name and location and dropping deleted events
+        """
+        # Setup
+        event = Event.objects.create(name="Jazz evening", type=self.event_type,
+                                     description="New Event",
+                                     date=date.today() + timedelta(days=10),
+                                     time="12:38:00", location="Goa", subscription_fee=0,
+                                     no_of_tickets=100, event_created_by_id=self.user_id)
+        run_on_commit_callbacks()
+
+        # Run
+        event.description = "Updated Event"
+        event.save()
+        unchanged_callbacks = len(connection.run_on_commit)
+        run_on_commit_callbacks()
+        event.name = "Jazz night"
+        event.save()
+        renamed_callbacks = len(connection.run_on_commit)
+        run_on_commit_callbacks()
+        prefix_matches = event_index.search("jaz")
+        inner_matches = event_index.search("azz")
+        event_id = event.id
+        event.delete()
+        run_on_commit_callbacks()
+
+        # Check
+        self.assertEqual(renamed_callbacks, unchanged_callbacks + 1)
+        self.assertIn(event_id, prefix_matches)
+        self.assertEqual(inner_matches, {})
+        self.assertEqual(event_index.search("jazz"), {})
+        self.assertEqual(event_index.search("evening"), {})
+
+    def test_event_get_api_serves_cached_catalogue_with_user_flags(self):
+        """
+        Unit test for event get api reusing the cached catalogue and merging fresh user flags
+        """
+        # Setup
+        event = Event.objects.create(name="cached", type=self.event_type, description="New Event",
+                                     date=date.today() + timedelta(days=10), time="12:38:00",
+                                     location="karnal", subscription_fee=0, no_of_tickets=100,
+                                     event_created_by_id=self.user_id)
+
+        def fetch_events():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get("/core/event/?limit=10",
+                                           HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                           content_type="application/json")
+            return response, len(context.captured_queries)
+
+        # Run
+        first_response, first_queries = fetch_events()
+        second_response, second_queries = fetch_events()
+        WishList.objects.create(user_id=self.user_id2, event=event)
+        run_on_commit_callbacks()
+        third_response, _ = fetch_events()
+
+        # Check
+        self.assertLess(second_queries, first_queries)
+        self.assertEqual(first_response.data, second_response.data)
+        self.assertFalse(second_response.data['data']['event_list'][0]['is_wishlisted'])
+        self.assertTrue(third_response.data['data']['event_list'][0]['is_wishlisted'])
+
+    def test_event_get_api_answers_not_modified_for_current_etag(self):
+        """
+        Unit test for event list and details answering 304 while the client copy is current
+        """
+        for url in ("/core/event/", "/core/event/{}/".format(self.event.id)):
+            # Run
+            response = self.client.get(url, HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                       content_type="application/json")
+            not_modified = self.client.get(url, HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                           HTTP_IF_NONE_MATCH=response['ETag'],
+                                           content_type="application/json")
+            WishList.objects.create(user_id=self.user_id2, event=self.event)
+            run_on_commit_callbacks()
+            modified = self.client.get(url, HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                       HTTP_IF_NONE_MATCH=response['ETag'],
+                                       content_type="application/json")
+            WishList.objects.filter(user_id=self.user_id2).delete()
+            run_on_commit_callbacks()
+
+            # Check
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified['ETag'], response['ETag'])
+            self.assertEqual(modified.status_code, 200)
+
+    def test_event_retrieve_api_etag_follows_sharded_reservations(self):
+        """
+        Unit test for event details of a sharded event, a reservation on a shard changes the etag
+        """
+        # Setup
+        shard_event_tickets(self.event.id, 2)
+        url = "/core/event/{}/".format(self.event.id)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                   content_type="application/json")
+
+        # Run
+        reserve_tickets(self.event.id, 1)
+        modified = self.client.get(url, HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                   HTTP_IF_NONE_MATCH=response['ETag'],
+                                   content_type="application/json")
+
+        # Check
+        self.assertEqual(modified.status_code, 200)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+
+    def test_event_get_api_with_sparse_fieldset(self):
+        """
+        Unit test for event list and details returning only the fields asked for
+        """
+        # Setup
+        Event.objects.create(name="sparse", type=self.event_type, description="New Event",
+                             date=date.today() + timedelta(days=10), time="12:38:00",
+                             location="karnal", subscription_fee=0, no_of_tickets=100,
+                             event_created_by_id=self.user_id)
+
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            list_response = self.client.get("/core/event/?fields=name,is_wishlisted",
+                                            HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                            content_type="application/json")
+            events = response_json(list_response)['data']
+        event_query = next(query['sql'] for query in context.captured_queries
+                           if 'FROM "core_event"' in query['sql'] and 'ORDER BY' in query['sql'])
+        detail_response = self.client.get("/core/event/{}/?fields=name,remaining_tickets".format(
+            self.event.id), HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+            content_type="application/json")
+        invalid_response = self.client.get("/core/event/?fields=name,password",
+                                           HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                           content_type="application/json")
+
+        # Check
+        self.assertEqual(list_response.status_code, 200)
+        self.assertEqual(list(events[0]), ['id', 'name', 'is_wishlisted'])
+        self.assertNotIn('"description"', event_query)
+        self.assertNotIn('core_userfeedback', event_query)
+        self.assertEqual(detail_response.data['data'],
+                         {'id': self.event.id, 'name': 'test_event', 'remaining_tickets': 250})
+        self.assertEqual(invalid_response.status_code, 400)
+
+    def test_event_get_api_streamed(self):
+        """
+        Unit test for event get api streaming the event list when it is not paginated
+        """
+        # Setup
+        for index in range(3):
+            Event.objects.create(name="streamed {}".format(index), type=self.event_type,
+                                 description="New Event", date=date.today() + timedelta(days=10),
+                                 time="12:38:00", location="karnal", subscription_fee=0,
+                                 no_of_tickets=100, event_created_by_id=self.user_id)
+
+        # Run
+        response = self.client.get("/core/event/?limit=10",
+                                   HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                   content_type="application/json")
+        streamed_response = self.client.get("/core/event/",
+                                            HTTP_AUTHORIZATION="Bearer {}".format(self.token2),
+                                            content_type="application/json")
+
+        # Check
+        self.assertEqual(streamed_response.status_code, 200)
+        self.assertTrue(streamed_response.streaming)
+        self.assertEqual(response_json(streamed_response)['data'],
+                         json.loads(response.content)['data']['event_list'])
+
+    def test_event_patch_api_authorizes_from_token_claims(self):
+        """
+        Unit test for event patch api taking the role from the token and refusing the token
+        once the role of the user has changed
+        """
+        # Setup
+        data = {"description": "Updated Event", "testing": True}
+
+        # Run
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch("/core/event/{}/".format(self.event.id), json.dumps(data),
+                                         HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                         content_type="application/json")
+        auth_queries = [query for query in context.captured_queries
+                        if 'FROM "core_userprofile"' in query['sql']
+                        or 'FROM "authentication_user"' in query['sql']]
+        profile = UserProfile.objects.get(user_id=self.user_id)
+        profile.role = Role.objects.get(role="subscriber")
+        profile.save()
+        revoked_response = self.client.patch("/core/event/{}/".format(self.event.id),
+                                             json.dumps(data),
+                                             HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                                             content_type="application/json")
+
+        # Check
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(auth_queries), 1)
+        self.assertEqual(revoked_response.status_code, 401)
+
+    def test_event_attendees_api(self):
+        """
+        Unit test for the paginated and exported attendee list of an event
+        """
+        # Setup
+        Subscription.objects.create(user_id=self.user_id2, event=self.event, no_of_tickets=2,
+                                    amount=998)
+        Subscription.objects.create(user_id=self.user_id2, event=self.event, no_of_tickets=-1,
+                                    amount=-499)
+        Subscription.objects.create(user_id=self.user_id, event=self.event, no_of_tickets=1,
+                                    amount=499)
+        end_point = f"/core/event/{self.event.id}/attendees/"
+
+        # Run
+        first_page = self.client.get(end_point, {"limit": 1},
+                                     HTTP_AUTHORIZATION="Bearer {}".format(self.token))
+        second_page = self.client.get(end_point, {"limit": 1,
+                                                  "cursor": first_page.data['data']['next_cursor']},
+                                      HTTP_AUTHORIZATION="Bearer {}".format(self.token))
+        export = self.client.get(end_point, {"export": "csv"},
+                                 HTTP_AUTHORIZATION="Bearer {}".format(self.token))
+        subscriber_response = self.client.get(end_point,
+                                              HTTP_AUTHORIZATION="Bearer {}".format(self.token2))
+
+        # Check
+        self.assertEquals(first_page.status_code, 200)
+        self.assertEquals(first_page.data['data']['attendees'][0]['user_id'], self.user_id)
+        self.assertEquals(second_page.data['data']['attendees'],
+                          [{'user_id': self.user_id2, 'name': 'user20@gmail.com',
+                            'email': 'user20@gmail.com', 'no_of_tickets': 1, 'paid_amount': 499}])
+        self.assertIsNone(second_page.data['data']['next_cursor'])
+        lines = b''.join(export.streaming_content).decode('UTF-8').splitlines()
+        self.assertEquals(lines[0], 'user_id,name,email,no_of_tickets,paid_amount')
+        self.assertEquals(len(lines), 3)
+        self.assertEquals(subscriber_response.status_code, 403)
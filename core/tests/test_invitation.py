@@ -7,6 +7,7 @@ from rest_framework.test import APITestCase
 
 from authentication.models import Role, User
 from core.models import EventType, Event, UserProfile, Invitation
+from core.tests.test_event import response_json
 
 
 class InvitationTestCase(APITestCase):
@@ -87,6 +88,28 @@ class InvitationTestCase(APITestCase):
         )
         self.assertEquals(response.status_code, 200)
 
+    def test_invitation_get_api_streamed(self):
+        """
+        Unit test for invitation get api streaming the invitee list
+        """
+        # Setup
+        Invitation.objects.create(event=self.event, discount_percentage=10, email="abcd@gmail.com")
+        Invitation.objects.create(event=self.event, user_id=self.user_id, discount_percentage=5,
+                                  email="user12@gmail.com")
+
+        # Run
+        streamed_response = self.client.get(
+            self.end_point, HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+        )
+
+        # Check
+        self.assertEquals(streamed_response.status_code, 200)
+        self.assertTrue(streamed_response.streaming)
+        data = response_json(streamed_response)
+        self.assertEquals(data['message'], "Invitations details")
+        self.assertEquals(sorted(invited['email'] for invited in data['data']['invitee_list']),
+                          ["abcd@gmail.com", "user12@gmail.com"])
+
     def test_invitation_get_api_with_particular_event(self):
         """
         Unit test for invitation get api with event id
@@ -114,7 +137,7 @@ class InvitationTestCase(APITestCase):
             HTTP_AUTHORIZATION="Bearer {}".format(self.token),
         )
         self.assertEquals(response.status_code, 200)
-        self.assertEquals(len(response.data['data']['invitee_list']), 0)
+        self.assertEquals(len(response_json(response)['data']['invitee_list']), 0)
 
     def test_invitation_post_api_with_invalid_event_id(self):
         """
@@ -2,13 +2,32 @@
 Test for subscriptions are here
 """
 import json
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
+import jwt
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 
 # Create your tests here.
 from authentication.models import Role
-from core.models import Event, EventType
+from core.catalogue import get_catalogue_version
+from core.holds import charge_ticket_hold, create_ticket_hold
+from core.inventory import release_tickets, reserve_tickets, shard_event_tickets
+from core.models import Event, EventTicketShard, EventType, IdempotencyKey, Subscription, \
+    TicketHold, UserEventTicketBalance
+from core.tasks import process_ticket_hold, reconcile_subscription_payments, \
+    release_expired_ticket_holds, sync_sharded_sold_tickets
+from core.tests.test_event import run_on_commit_callbacks
+from eon_backend.celery import app as celery_app
+from utils.common import PaymentTokenCache
+from utils.payment import CircuitOpenError, PaymentClient, PaymentServiceError, payment_client
+from utils.payment_server import PaymentServer
 
 
 class SubscriptionAPITest(APITestCase):
@@ -16,6 +35,22 @@ class SubscriptionAPITest(APITestCase):
     Subscription methods test cases are added in this class
     """
 
+    @classmethod
+    def setUpClass(cls):
+        """
+        Starts a local payment service for the subscription calls
+        """
+        cls.payment_server = PaymentServer().start()
+        cls.payment_settings = override_settings(PAYMENT_URL=cls.payment_server.url)
+        cls.payment_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.payment_settings.disable()
+        cls.payment_server.stop()
+
     def setUp(cls):
         """
         Data setup for the Subscription Unit test cases
@@ -56,6 +91,7 @@ class SubscriptionAPITest(APITestCase):
         cls.event_free.save()
 
         cls.end_point = "/core/subscription/"
+        cls.payment_server.fail_next = 0
 
     def test_subscription_api_with_wrong_method_type(self):
         """
@@ -102,7 +138,7 @@ class SubscriptionAPITest(APITestCase):
             "user_id": self.user_id,
             "no_of_tickets": 4,
             "card_number": 5039303342356004,
-            "expiry_year": 2022,
+            "expiry_year": 2099,
             "expiry_month": 7,
             "amount": 400,
             "discount_amount": 0
@@ -113,6 +149,21 @@ class SubscriptionAPITest(APITestCase):
         )
         self.assertEquals(response.status_code, 201)
 
+    def test_subscription_api_keeps_catalogue_version(self):
+        """
+        Unit test for subscription post api, a purchase does not invalidate the cached catalogue
+        """
+        # Setup
+        run_on_commit_callbacks()
+        version = get_catalogue_version()
+
+        # Run
+        self.test_subscription_api_with_paid_event()
+        run_on_commit_callbacks()
+
+        # Check
+        self.assertEquals(get_catalogue_version(), version)
+
     def test_subscription_api_with_invalid_event_id(self):
         """
         Unit test for subscription post api with invalid event id
@@ -137,7 +188,7 @@ class SubscriptionAPITest(APITestCase):
             "user_id": self.user_id,
             "no_of_tickets": 1000,
             "card_number": 5039303342356004,
-            "expiry_year": 2022,
+            "expiry_year": 2099,
             "expiry_month": 7,
             "amount": 10000,
             "discount_amount": 0
@@ -157,7 +208,7 @@ class SubscriptionAPITest(APITestCase):
             "user_id": self.user_id,
             "no_of_tickets": 1,
             "card_number": 50393033423,  # length is less the 16
-            "expiry_year": 2022,
+            "expiry_year": 2099,
             "expiry_month": 7,
             "amount": 100,
             "discount_amount": 0
@@ -177,7 +228,7 @@ class SubscriptionAPITest(APITestCase):
             "user_id": self.user_id,
             "no_of_tickets": 10,
             "card_number": "INVALID CARD",
-            "expiry_year": 2022,
+            "expiry_year": 2099,
             "expiry_month": 7,
             "amount": 1000,
             "discount_amount": 0
@@ -218,7 +269,7 @@ class SubscriptionAPITest(APITestCase):
             "user_id": self.user_id,
             "no_of_tickets": -2,
             "card_number": 5039303342356004,
-            "expiry_year": 2022,
+            "expiry_year": 2099,
             "expiry_month": 7,
             "amount": -400,
             "discount_amount": 0
@@ -228,6 +279,9 @@ class SubscriptionAPITest(APITestCase):
             content_type='application/json'
         )
         self.assertEquals(response.status_code, 201)
+        self.assertEquals(response.data['data']['no_of_tickets'], 2)
+        self.assertEquals(response.data['data']['total_amount'], 0)
+        self.assertEquals(response.data['data']['event_name'], self.event.name)
 
     def test_subscription_api_with_free_event(self):
         """
@@ -254,3 +308,473 @@ class SubscriptionAPITest(APITestCase):
             content_type='application/json'
         )
         self.assertEquals(response.status_code, 200)
+
+    def test_subscription_updates_event_popularity(self):
+        """
+        Unit test for subscription and unsubscription keeping the event popularity in step
+        """
+        self.test_subscription_api_with_free_event()
+        self.event_free.refresh_from_db()
+        self.assertEquals(self.event_free.sold_tickets, 4)
+        self.assertEquals(self.event_free.popularity, 4 * 100000 // 250)
+
+        self.client.delete(
+            f"/core/subscription/{str(self.event_free.id)}/",
+            HTTP_AUTHORIZATION="Bearer {}".format(self.token), content_type='application/json'
+        )
+        self.event_free.refresh_from_db()
+        self.assertEquals(self.event_free.sold_tickets, 0)
+        self.assertEquals(self.event_free.popularity, 0)
+
+    def test_subscription_api_with_payment_service_failure(self):
+        """
+        Unit test for subscription post api when the payment service answers with an error
+        """
+        self.payment_server.fail_next = 1
+        data = {
+            "event_id": self.event.id,
+            "user_id": self.user_id,
+            "no_of_tickets": 4,
+            "card_number": 5039303342356004,
+            "expiry_year": 2099,
+            "expiry_month": 7,
+            "amount": 400,
+            "discount_amount": 0
+        }
+        response = self.client.post(
+            self.end_point, json.dumps(data), HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+            content_type='application/json'
+        )
+        self.assertEquals(response.status_code, 500)
+        self.event.refresh_from_db()
+        self.assertEquals(self.event.sold_tickets, 0)
+
+    def test_subscription_api_refunds_payment_when_tickets_sold_out(self):
+        """
+        Unit test for subscription post api refunding the payment when another buyer takes
+        the last tickets while the payment is processed
+        """
+        # Setup
+        create_payment = payment_client.create_payment
+
+        def pay_and_sell_out(user_id, data):
+            payment_object = create_payment(user_id, data)
+            if data['amount'] > 0:
+                reserve_tickets(self.event.id, 248)
+            return payment_object
+
+        data = {
+            "event_id": self.event.id,
+            "no_of_tickets": 4,
+            "card_number": 5039303342356004,
+            "expiry_year": 2099,
+            "expiry_month": 7,
+            "amount": 400,
+            "discount_amount": 0
+        }
+
+        # Run
+        with patch.object(payment_client, 'create_payment', side_effect=pay_and_sell_out):
+            response = self.client.post(
+                self.end_point, json.dumps(data), HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                content_type='application/json'
+            )
+
+        # Check
+        self.assertEquals(response.status_code, 400)
+        refund = self.payment_server.payments[max(self.payment_server.payments)]
+        self.assertEquals((refund['status'], refund['total_amount'], refund['no_of_tickets']),
+                          (3, 400, -4))
+        self.assertFalse(Subscription.objects.filter(user_id=self.user_id).exists())
+
+    def test_payment_client_retries_and_opens_circuit(self):
+        """
+        Unit test for the payment client retrying reads and failing fast once the circuit opens
+        """
+        # Setup
+        client = PaymentClient(url=self.payment_server.url, max_retries=1, backoff=0,
+                               failure_threshold=2, reset_timeout=60)
+        self.payment_server.fail_next = 1
+
+        # Run
+        payments = client.get_payments(self.user_id, [])
+        self.payment_server.fail_next = 3
+
+        # Check
+        self.assertEquals(payments, [])
+        with self.assertRaises(PaymentServiceError):
+            client.get_payments(self.user_id, [])
+        with self.assertRaises(CircuitOpenError):
+            client.get_payments(self.user_id, [])
+        self.assertEquals(self.payment_server.fail_next, 1)
+
+    def test_event_details_served_without_payment_service(self):
+        """
+        Unit test for the subscription summary of a paid event read from the stored amounts
+        """
+        # Setup
+        self.test_subscription_api_with_paid_event()
+
+        # Run
+        with override_settings(PAYMENT_URL=""):
+            response = self.client.get(f"/core/event/{self.event.id}/",
+                                       HTTP_AUTHORIZATION="Bearer {}".format(self.token))
+
+        # Check
+        self.assertEquals(response.status_code, 200)
+        details = response.data['data']['subscription_details']
+        self.assertEquals(details['no_of_tickets_bought'], 4)
+        self.assertEquals(details['amount_paid'], 400)
+        self.assertEquals(details['discount_given'], 0)
+
+    def test_reconcile_subscription_payments_task(self):
+        """
+        Unit test for the reconciliation of the stored amounts with the payment service
+        """
+        # Setup
+        self.test_subscription_api_with_paid_event()
+        subscription = Subscription.objects.get(user_id=self.user_id, event=self.event)
+        Subscription.objects.filter(id=subscription.id).update(amount=1)
+
+        # Run
+        first_run = reconcile_subscription_payments()
+        second_run = reconcile_subscription_payments()
+
+        # Check
+        subscription.refresh_from_db()
+        self.assertEquals(first_run, 1)
+        self.assertEquals(second_run, 0)
+        self.assertEquals(subscription.amount, 400)
+        self.assertIsNotNone(subscription.reconciled_on)
+
+    def test_reconcile_subscription_payments_task_passes_unknown_payments(self):
+        """
+        Unit test for the reconciliation, a payment unknown to the payment service does not
+        keep the next subscriptions from being reconciled
+        """
+        # Setup
+        Subscription.objects.bulk_create([Subscription(
+            user_id=self.user_id, event=self.event_free, no_of_tickets=1, id_payment=99999,
+            amount=100, discount_amount=0)])
+        self.test_subscription_api_with_paid_event()
+
+        # Run
+        first_run = reconcile_subscription_payments(batch_size=1)
+        second_run = reconcile_subscription_payments(batch_size=1)
+
+        # Check
+        self.assertEquals(first_run, 0)
+        self.assertEquals(second_run, 1)
+        self.assertTrue(Subscription.objects.filter(id_payment=99999, reconciled_on__isnull=True,
+                                                    last_reconcile_attempt__isnull=False).exists())
+
+    def test_payment_token_reused_until_refresh_margin(self):
+        """
+        Unit test for the payment service tokens cached per user
+        """
+        # Setup
+        tokens = PaymentTokenCache(size=1, lifetime=120, refresh_margin=60)
+
+        # Run
+        first_token = tokens.get(self.user_id)
+        second_token = tokens.get(self.user_id)
+        tokens.get(self.user_id + 1)
+        tokens.refresh_margin = 120
+        refreshed_token = tokens.get(self.user_id + 1)
+
+        # Check
+        self.assertEquals(first_token, second_token)
+        self.assertIn('exp', jwt.decode(refreshed_token, verify=False))
+        self.assertEquals(tokens.stats(), {'hits': 1, 'misses': 3, 'size': 1})
+
+    def test_reserve_tickets_never_oversells(self):
+        """
+        Unit test for the conditional reservation of the tickets of an event
+        """
+        # Setup
+        self.event.no_of_tickets = 5
+        self.event.save()
+
+        # Run
+        first_reservation = reserve_tickets(self.event.id, 4)
+        second_reservation = reserve_tickets(self.event.id, 2)
+        release = release_tickets(self.event.id, 5)
+
+        # Check
+        self.event.refresh_from_db()
+        self.assertTrue(first_reservation)
+        self.assertFalse(second_reservation)
+        self.assertFalse(release)
+        self.assertEquals(self.event.sold_tickets, 4)
+
+    def test_sharded_event_tickets(self):
+        """
+        Unit test for the reservations of an event whose tickets are spread over shards
+        """
+        # Setup
+        self.event.no_of_tickets = 10
+        self.event.sold_tickets = 3
+        self.event.save()
+        shard_event_tickets(self.event.id, 4)
+
+        # Run
+        reservations = [reserve_tickets(self.event.id, 2) for _ in range(3)]
+        spread_reservation = reserve_tickets(self.event.id, 1)
+        oversold_reservation = reserve_tickets(self.event.id, 1)
+        synced_events = sync_sharded_sold_tickets()
+
+        # Check
+        self.event.refresh_from_db()
+        self.assertEquals(reservations, [True, True, True])
+        self.assertTrue(spread_reservation)
+        self.assertFalse(oversold_reservation)
+        self.assertEquals(synced_events, 1)
+        self.assertEquals(self.event.sold_tickets, 10)
+        self.assertEquals(EventTicketShard.objects.filter(event=self.event).count(), 4)
+        shard_event_tickets(self.event.id, 0)
+        self.assertFalse(EventTicketShard.objects.filter(event=self.event).exists())
+        self.assertTrue(release_tickets(self.event.id, 10))
+
+    def test_ticket_hold_api(self):
+        """
+        Unit test for holding tickets of a paid event and confirming them once paid
+        """
+        # Setup
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+        data = {
+            "event_id": self.event.id,
+            "no_of_tickets": 4,
+            "card_number": 5039303342356004,
+            "expiry_year": 2099,
+            "expiry_month": 7,
+            "amount": 400,
+            "discount_amount": 0
+        }
+
+        # Run
+        response = self.client.post(
+            "/core/subscription-hold/", json.dumps(data),
+            HTTP_AUTHORIZATION="Bearer {}".format(self.token), content_type='application/json'
+        )
+        hold_response = self.client.get(
+            f"/core/subscription-hold/{response.data['data']['hold_id']}/",
+            HTTP_AUTHORIZATION="Bearer {}".format(self.token)
+        )
+
+        # Check
+        self.assertEquals(response.status_code, 202)
+        self.assertEquals(hold_response.data['data']['status'], 'confirmed')
+        self.assertEquals(hold_response.data['data']['amount'], 400)
+        self.event.refresh_from_db()
+        self.assertEquals(self.event.sold_tickets, 4)
+
+    def test_paid_ticket_hold_confirmed_without_card_details(self):
+        """
+        Unit test for a hold charged in the request and confirmed from its recorded payment,
+        by a redelivered task or the reaper, and refunded when it expired during the charge
+        """
+        # Setup
+        payment_data = {
+            "card_number": 5039303342356004,
+            "expiry_year": 2099,
+            "expiry_month": 7,
+            "amount": 200,
+            "discount_amount": 0,
+            "no_of_tickets": 2
+        }
+        hold = create_ticket_hold(self.user_id, self.event.id, 2)
+        lost_hold = create_ticket_hold(self.user_id, self.event.id, 2)
+        expired_hold = create_ticket_hold(self.user_id, self.event.id, 2)
+
+        # Run
+        charged_status = charge_ticket_hold(hold, payment_data)
+        payments_before = len(self.payment_server.payments)
+        status = process_ticket_hold(hold.id)
+        redelivered_status = process_ticket_hold(hold.id)
+        # the confirmation task of this hold was lost, the reaper confirms it
+        charge_ticket_hold(lost_hold, payment_data)
+        TicketHold.objects.filter(id__in=[lost_hold.id, expired_hold.id]).update(
+            expires_on=timezone.now())
+        release_expired_ticket_holds()
+        expired_status = charge_ticket_hold(expired_hold, payment_data)
+
+        # Check
+        hold.refresh_from_db()
+        lost_hold.refresh_from_db()
+        expired_hold.refresh_from_db()
+        self.assertEquals((charged_status, status, redelivered_status),
+                          ('pending', 'confirmed', 'confirmed'))
+        self.assertEquals(len(self.payment_server.payments), payments_before + 3)
+        self.assertEquals(hold.subscription.id_payment, hold.id_payment)
+        self.assertEquals(hold.subscription.amount, 200)
+        self.assertEquals(lost_hold.status, 'confirmed')
+        self.assertEquals(expired_status, 'expired')
+        self.assertEquals(self.payment_server.payments[expired_hold.id_refund]['status'], 3)
+        self.event.refresh_from_db()
+        self.assertEquals(self.event.sold_tickets, 4)
+
+    def test_expired_ticket_holds_released(self):
+        """
+        Unit test for the release of the tickets of the expired holds
+        """
+        # Setup
+        hold = create_ticket_hold(self.user_id, self.event.id, 5)
+        TicketHold.objects.filter(id=hold.id).update(expires_on=timezone.now())
+
+        # Run
+        released_holds = release_expired_ticket_holds()
+
+        # Check
+        hold.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEquals(released_holds, 1)
+        self.assertEquals(hold.status, 'expired')
+        self.assertEquals(self.event.sold_tickets, 0)
+        self.assertEquals(process_ticket_hold(hold.id), 'expired')
+
+    def test_subscription_api_with_idempotency_key(self):
+        """
+        Unit test for a retried purchase replaying the response stored under its Idempotency-Key
+        """
+        # Setup
+        data = {
+            "event_id": self.event.id,
+            "no_of_tickets": 4,
+            "card_number": 5039303342356004,
+            "expiry_year": 2099,
+            "expiry_month": 7,
+            "amount": 400,
+            "discount_amount": 0
+        }
+
+        def purchase(body):
+            return self.client.post(
+                self.end_point, json.dumps(body), HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                HTTP_IDEMPOTENCY_KEY="purchase-1", content_type='application/json'
+            )
+
+        # Run
+        self.payment_server.fail_next = 1
+        failed_response = purchase(data)
+        payments_before = len(self.payment_server.payments)
+        first_response = purchase(data)
+        retried_response = purchase(data)
+        reused_response = purchase(dict(data, no_of_tickets=2))
+
+        # Check
+        self.assertEquals(failed_response.status_code, 500)
+        self.assertEquals(first_response.status_code, 201)
+        self.assertEquals(retried_response.status_code, 201)
+        self.assertEquals(retried_response['Idempotent-Replayed'], 'true')
+        self.assertEquals(retried_response.data['data']['curent_payment_id'],
+                          first_response.data['data']['curent_payment_id'])
+        self.assertEquals(reused_response.status_code, 422)
+        self.assertEquals(Subscription.objects.filter(user_id=self.user_id).count(), 1)
+        self.assertEquals(len(self.payment_server.payments), payments_before + 1)
+
+    def test_idempotency_key_taken_over_after_its_lease(self):
+        """
+        Unit test for a retry taking over the Idempotency-Key of a request which died before
+        storing its response, once the lease of the key ran out
+        """
+        # Setup
+        data = {
+            "event_id": self.event.id,
+            "no_of_tickets": 4,
+            "card_number": 5039303342356004,
+            "expiry_year": 2099,
+            "expiry_month": 7,
+            "amount": 400,
+            "discount_amount": 0
+        }
+
+        def purchase():
+            return self.client.post(
+                self.end_point, json.dumps(data), HTTP_AUTHORIZATION="Bearer {}".format(self.token),
+                HTTP_IDEMPOTENCY_KEY="purchase-2", content_type='application/json'
+            )
+
+        purchase()
+        # the request holding the key died before storing its response
+        keys = IdempotencyKey.objects.filter(user_id=self.user_id, key="purchase-2")
+        keys.update(status_code=None, response=None,
+                    locked_until=timezone.now() + timedelta(seconds=60))
+
+        # Run
+        locked_response = purchase()
+        keys.update(locked_until=timezone.now())
+        taken_over_response = purchase()
+        replayed_response = purchase()
+
+        # Check
+        self.assertEquals(locked_response.status_code, 409)
+        self.assertEquals(taken_over_response.status_code, 201)
+        self.assertEquals(replayed_response['Idempotent-Replayed'], 'true')
+        self.assertEquals(keys.get().status_code, 201)
+
+    def test_ticket_ledger_matches_subscriptions(self):
+        """
+        Unit test for the ticket balance kept in step with the subscriptions and its rebuild
+        """
+        # Setup
+        self.test_subscription_api_with_reducing_subscribed_ticket()
+        balance = UserEventTicketBalance.objects.get(user_id=self.user_id, event=self.event)
+
+        # Run
+        call_command('rebuild_ticket_ledger', stdout=StringIO())
+        rebuilt_balance = UserEventTicketBalance.objects.get(user_id=self.user_id, event=self.event)
+        self.client.delete(f"/core/subscription/{self.event.id}/",
+                           HTTP_AUTHORIZATION="Bearer {}".format(self.token))
+
+        # Check
+        self.assertEquals((balance.no_of_tickets, balance.amount_paid, balance.refunded_amount),
+                          (2, 400, 400))
+        self.assertEquals((rebuilt_balance.no_of_tickets, rebuilt_balance.amount_paid,
+                           rebuilt_balance.refunded_amount, rebuilt_balance.first_purchase_on),
+                          (2, 400, 400, balance.first_purchase_on))
+        self.assertFalse(UserEventTicketBalance.objects.filter(user_id=self.user_id).exists())
+        self.event.refresh_from_db()
+        self.assertEquals(self.event.sold_tickets, 0)
+
+    def test_async_subscription_api_with_status_polling(self):
+        """
+        Unit test for a purchase paid in the background and its long-polled status
+        """
+        # Setup
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+        data = {
+            "event_id": self.event.id,
+            "no_of_tickets": 4,
+            "card_number": 50393033423,  # rejected by the payment service
+            "expiry_year": 2099,
+            "expiry_month": 7,
+            "amount": 400,
+            "discount_amount": 0
+        }
+
+        # Run
+        response = self.client.post(
+            f"{self.end_point}?async=True", json.dumps(data),
+            HTTP_AUTHORIZATION="Bearer {}".format(self.token), content_type='application/json'
+        )
+        status_response = self.client.get(
+            response.data['data']['status_url'], {"wait": 5},
+            HTTP_AUTHORIZATION="Bearer {}".format(self.token)
+        )
+        pending_hold = create_ticket_hold(self.user_id, self.event.id, 1)
+        started_at = time.monotonic()
+        pending_response = self.client.get(
+            f"/core/subscription-hold/{pending_hold.id}/", {"wait": 0.3},
+            HTTP_AUTHORIZATION="Bearer {}".format(self.token)
+        )
+
+        # Check
+        self.assertEquals(response.status_code, 202)
+        self.assertEquals(status_response.data['data']['status'], 'failed')
+        self.assertEquals(pending_response.data['data']['status'], 'pending')
+        self.assertEquals(pending_response['Retry-After'], '1')
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.3)
+        self.event.refresh_from_db()
+        self.assertEquals(self.event.sold_tickets, 1)
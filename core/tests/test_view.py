@@ -77,6 +77,7 @@ class RestAPITest(APITestCase):
                                    content_type="application/json")
         # check
         self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
 
     def test_for_get_user_api_with_wrong_token(self):
         """
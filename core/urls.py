@@ -8,12 +8,15 @@ from core.presigned_url import PresignedUrl
 from core.reports import filtered_event_summary, event_summary
 from core.routes import router
 from core.views import get_event_types, SubscriberNotify, send_mail_to_a_friend, get_event_summary
+from core.views_layer.attendees import AttendeeView
 from core.views_layer.invitation import InvitationViewSet
 from core.views_layer.notification import NotificationView
 from core.views_layer.feedback import get_feedback_questions, FeedbackView
 
 urlpatterns = [
     url('^', include(router.urls)),
+    re_path(r'^event/(?P<event_id>\d+)/attendees/$', AttendeeView.as_view(),
+            name="event_attendees"),
     url('presigned-url', PresignedUrl.as_view(), name="image_upload"),
     url(r'^invite', InvitationViewSet.as_view(), name="invite"),
     url('notify-subscriber', SubscriberNotify.as_view(), name="subscriber_notify"),
@@ -4,22 +4,19 @@ Added core related api view here
 import json
 from datetime import date
 
-import jwt
-
-from django.db.models import F, Q, Sum
+from django.db.models import F, Sum
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import authentication_classes, permission_classes, api_view
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.authentication import get_authorization_header
 
+from authentication.backends import RoleClaimJWTAuthentication
 from core.models import Event, Subscription, EventType
+from core.search import search_events
 from core.serializers import EventTypeSerializer
 from eon_backend.settings.common import EVENT_URL, LOGGER_SERVICE
 
-from utils.common import api_success_response, api_error_response
+from utils.common import api_success_response, api_error_response, get_user_id
 from utils.helper import send_email_sms_and_notification
-from eon_backend.settings.common import SECRET_KEY
 from utils.permission import IsOrganizer
 from utils.constants import EVENT_STATUS
 
@@ -27,7 +24,7 @@ logger = LOGGER_SERVICE
 
 
 @api_view(["GET"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([RoleClaimJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def get_event_types(request):
     """
@@ -43,7 +40,7 @@ class SubscriberNotify(APIView):
     """
         Created api method related to subscriber
     """
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (RoleClaimJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = Subscription.objects.filter(is_active=True)
 
@@ -83,7 +80,7 @@ class SubscriberNotify(APIView):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([RoleClaimJWTAuthentication])
 def send_mail_to_a_friend(request):
     """
         Function to send mail to an email_id.
@@ -117,7 +114,7 @@ def send_mail_to_a_friend(request):
 
 
 @api_view(["GET"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([RoleClaimJWTAuthentication])
 @permission_classes([IsAuthenticated, IsOrganizer])
 def get_event_summary(request):
     """
@@ -125,14 +122,11 @@ def get_event_summary(request):
     :param request: organizer id
     :return: data object returning the event details like sold tickets, revenue etc.
     """
-    token = get_authorization_header(request).split()[1]
-    payload = jwt.decode(token, SECRET_KEY)
-    user_id = payload['user_id']
+    user_id = get_user_id(request)
     search_text = request.GET.get("search", None)
     event_status_filter = request.GET.get('event_status', EVENT_STATUS['all'])
     today = date.today()
     queryset = Event.objects.filter(event_created_by=user_id).order_by('id')
-    queryset.filter(date__lt=str(today)).update(is_active=False)
     total_revenue, revenue_cancelled_events, revenue_completed_events, revenue_ongoing_events = 0, 0, 0, 0
 
     if event_status_filter.lower() == EVENT_STATUS['completed']:
@@ -145,7 +139,7 @@ def get_event_summary(request):
         queryset = queryset.filter(date__gte=str(today), is_active=True)
 
     if search_text:
-        queryset = queryset.filter(Q(location__icontains=search_text) | Q(name__icontains=search_text))
+        queryset = search_events(queryset, search_text)
 
     cancelled_events, completed_events, ongoing_events, total_events = 0, 0, 0, queryset.count()
     data = {'event_list': []}
@@ -0,0 +1,87 @@
+"""
+Attendee list of an event for its organizer is here
+"""
+from django.db.models import F
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+
+from authentication.backends import RoleClaimJWTAuthentication
+from core.models import Event, UserEventTicketBalance
+from core.serializers import SubscriptionListSerializer
+from eon_backend.settings.common import LOGGER_SERVICE, MAX_PAGE_LIMIT
+from utils.common import api_error_response, api_success_response
+from utils.mixins import AuthenticatedUserMixin
+from utils.pagination import PaginationError, keyset_paginate, parse_limit
+from utils.permission import IsOrganizer
+from utils.roles import get_user_role
+from utils.streaming import streaming_csv_response, streaming_ndjson_response
+
+logger = LOGGER_SERVICE
+
+ATTENDEE_FIELDS = ('user_id', 'name', 'email', 'no_of_tickets', 'paid_amount')
+
+
+class AttendeeView(AuthenticatedUserMixin, generics.GenericAPIView):
+    """
+    Attendees of an event with their tickets and paid amount, one row per user
+    """
+    authentication_classes = (RoleClaimJWTAuthentication,)
+    permission_classes = (IsAuthenticated, IsOrganizer)
+    serializer_class = SubscriptionListSerializer
+    queryset = UserEventTicketBalance.objects.all()
+
+    def get(self, request, event_id):
+        """
+        Function to list the attendees of an event of the logged in organizer
+        :param request: may contain limit and cursor to page through the attendees, or
+                        export=csv|ndjson to download all of them
+        :param event_id: id of the event
+        :return: attendee list
+        """
+        user_id = self.user_id
+        try:
+            event = Event.objects.only('id', 'event_created_by').get(id=event_id)
+        except Event.DoesNotExist:
+            logger.log_error(f"No event exist with id={event_id}")
+            return api_error_response(message="No event exist with id={}".format(event_id))
+        if event.event_created_by_id != user_id and get_user_role(request) != "admin":
+            logger.log_error(f"LoggedIn user with id {user_id} is not the organizer of event "
+                             f"{event_id}")
+            return api_error_response(message="You are not allowed to perform this action",
+                                      status=400)
+
+        queryset = get_attendees(event_id)
+        export = request.GET.get('export', None)
+        if export:
+            rows = (SubscriptionListSerializer(row).data for row in
+                    queryset.order_by('user_id').iterator())
+            logger.log_info(f"Attendees of event {event_id} exported as {export} by user {user_id}")
+            if export == 'csv':
+                return streaming_csv_response(rows, ATTENDEE_FIELDS,
+                                              f"event_{event_id}_attendees.csv")
+            if export == 'ndjson':
+                return streaming_ndjson_response(rows)
+            return api_error_response(message="Export must be csv or ndjson", status=400)
+
+        try:
+            limit = parse_limit(request.GET.get('limit', MAX_PAGE_LIMIT), MAX_PAGE_LIMIT)
+            attendees, next_cursor = keyset_paginate(queryset, ['user_id'], limit,
+                                                     request.GET.get('cursor', None))
+        except PaginationError as err:
+            return api_error_response(message=str(err), status=400)
+        data = {'attendees': SubscriptionListSerializer(attendees, many=True).data,
+                'next_cursor': next_cursor}
+        logger.log_info(f"Attendees of event {event_id} fetched by user {user_id}")
+        return api_success_response(message="Attendee list", data=data)
+
+
+def get_attendees(event_id):
+    """
+    Function to get the attendees of an event, their tickets and amounts are read from the
+    ticket balances joined to the users and their profiles in a single query
+    :param event_id: id of the event
+    :return: values queryset with one row per attendee
+    """
+    return UserEventTicketBalance.objects.filter(event_id=event_id, no_of_tickets__gt=0).values(
+        'user_id', 'no_of_tickets', name=F('user__userprofile__name'), email=F('user__email'),
+        paid_amount=F('amount_paid') - F('refunded_amount'))
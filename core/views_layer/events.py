@@ -2,33 +2,63 @@
 Events related functions are here
 """
 from datetime import date, datetime
-import json
 
-import requests
-import jwt
-from django.db.models import ExpressionWrapper, F, IntegerField, Q
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.viewsets import ModelViewSet
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.authentication import get_authorization_header
 
-from core.models import Event, UserProfile, Subscription, WishList, Invitation, UserFeedback
+from authentication.backends import RoleClaimJWTAuthentication
+from core.catalogue import bump_catalogue_version, get_catalogue_page, get_catalogue_version, \
+    get_last_modified, get_user_event_flags, get_user_flags_version, merge_user_event_flags
+from core.inventory import get_sold_tickets
+from core.ledger import get_balance
+from core.models import Event, EventTicketShard, UserProfile, Subscription, WishList, \
+    Invitation, UserFeedback
+from core.search import search_events
 from core.serializers import ListUpdateEventSerializer, EventSerializer
-from utils.common import api_error_response, api_success_response, payment_token
+from utils.common import api_error_response, api_success_response, \
+    conditional_response, make_etag, set_validators
 from utils.helper import send_email_sms_and_notification
+from utils.mixins import AuthenticatedUserMixin
 from utils.s3 import AwsS3
+from utils.streaming import iterate_in_chunks, streaming_success_response
+from utils.pagination import PaginationError, keyset_paginate, parse_limit
+from utils.roles import get_user_role
 from utils.permission import IsOrganizerOrReadOnlySubscriber
-from eon_backend.settings.common import SECRET_KEY, LOGGER_SERVICE, PAYMENT_URL, BUCKET, AWS_REGION
+from eon_backend.settings.common import LOGGER_SERVICE, BUCKET, AWS_REGION, \
+    MAX_PAGE_LIMIT
 from utils.constants import EVENT_STATUS, SUBSCRIPTION_TYPE
 
 logger = LOGGER_SERVICE
 
-
-class EventViewSet(ModelViewSet):
+# fields of the event responses, the ones accepted by the fields query parameter
+EVENT_ROW_FIELDS = ("id", "name", "date", "time", "location", "event_type", "description",
+                    "no_of_tickets", "sold_tickets", "subscription_fee", "images", "external_links")
+EVENT_LIST_FIELDS = EVENT_ROW_FIELDS + ("is_free", "feedback_count", "event_status",
+                                        "is_subscribed", "is_wishlisted", "feedback_given")
+EVENT_DETAIL_FIELDS = EVENT_ROW_FIELDS + ("invitee_list", "self_organised", "event_status",
+                                          "feedback_count", "subscription_details",
+                                          "discount_percentage", "is_wishlisted", "is_subscribed",
+                                          "feedback_given", "remaining_tickets")
+USER_FLAG_FIELDS = ("is_subscribed", "is_wishlisted", "feedback_given")
+# columns needed by the fields which are not plain columns of the event
+EVENT_FIELD_COLUMNS = {
+    "id": (), "event_type": ("type",), "is_free": ("subscription_fee",), "feedback_count": (),
+    "event_status": ("is_active", "is_cancelled"), "is_subscribed": ("subscription_fee",),
+    "is_wishlisted": (), "feedback_given": (), "invitee_list": (),
+    "self_organised": ("event_created_by",),
+    "subscription_details": ("subscription_fee",), "discount_percentage": ("subscription_fee",),
+    "remaining_tickets": ("no_of_tickets", "sold_tickets", "ticket_shards"),
+}
+
+
+class EventViewSet(AuthenticatedUserMixin, ModelViewSet):
     """
       Event api are created here
     """
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (RoleClaimJWTAuthentication,)
     permission_classes = (IsAuthenticated, IsOrganizerOrReadOnlySubscriber)
     queryset = Event.objects.filter(
         is_active=True).select_related('type').annotate(event_type=F('type__type'))
@@ -38,132 +68,70 @@ class EventViewSet(ModelViewSet):
     def list(self, request, *args, **kwargs):
         """
         Function to give list of Events based on different filter parameters
-        :param request: contain the query type and it's value
-        :return: Response contains complete list of events after the query
+        :param request: contain the query type and it's value, limit and cursor for a page
+        :return: Response contains complete list of events after the query, streamed when it
+        is not paginated
         """
-        search_text = request.GET.get("search", None)
-        event_type = request.GET.get("event_type", None)
-        start_date = request.GET.get("start_date", None)
-        end_date = request.GET.get("end_date", None)
-        event_created_by = request.GET.get("event_created_by", False)
-        is_wishlisted = request.GET.get('is_wishlisted', False)
-        event_status = request.GET.get('event_status', EVENT_STATUS['default'])
-        subscription_type = request.GET.get('subscription_type', SUBSCRIPTION_TYPE['default'])
-
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         logger.log_info(f"Event list request initiated by user {user_id}")
         try:
-            user_logged_in = user_id
-            user_role = UserProfile.objects.get(user_id=user_logged_in).role.role
+            fields, limit = get_event_list_parameters(request.GET)
+        except ValueError as err:
+            logger.log_error(f"Invalid event list request by user {user_id}: {err}")
+            return api_error_response(message=str(err), status=400)
+
+        etag = make_etag(get_catalogue_version(), get_user_flags_version(user_id), user_id,
+                         sorted(request.GET.lists()))
+        last_modified = get_last_modified(user_id)
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified:
+            logger.log_info(f"Event list not modified for user_id {user_id}")
+            return not_modified
+        try:
+            user_role = get_user_role(request)
         except Exception:
             logger.log_error(f"Fetching of user role for user_id {user_id} failed")
             return api_error_response(
                 message="Not able to fetch the role of the logged in user", status=500)
 
-        if event_status.lower() == EVENT_STATUS['all']:
-            self.queryset = Event.objects.all()
-            event_status = event_status.lower()
-
-        today = date.today()
-        self.queryset.filter(date__lt=str(today)).update(is_active=False)
-
-        if event_status.lower() == EVENT_STATUS['completed']:
-            self.queryset = Event.objects.filter(is_active=False, is_cancelled=False)
+        queryset, event_status = filter_events(self.queryset, request.GET, user_id)
+        ordering = get_event_ordering(request.GET)
+        queryset = queryset.select_related(None).only(*get_event_columns(fields), 'popularity')
+        if 'feedback_count' in fields:
+            queryset = annotate_feedback_count(queryset)
+        flags = [flag for flag in USER_FLAG_FIELDS if flag in fields] \
+            if user_role == 'subscriber' else []
+
+        if not limit:
+            # an unpaginated list is written while it is read, it is never held in memory
+            # nor cached
+            rows = iterate_in_chunks(queryset.order_by(*ordering), lambda events: add_user_flags(
+                [get_event_row(curr_event, event_status, fields) for curr_event in events],
+                flags, user_id))
+            logger.log_info(f"Event list streamed to user_id {user_id}")
+            response = streaming_success_response(rows, message="List of events")
+            return set_validators(response, etag, last_modified)
 
-        if event_status.lower() == EVENT_STATUS['cancelled']:
-            self.queryset = Event.objects.filter(is_active=False, is_cancelled=True)
-
-        if event_status.lower() == EVENT_STATUS['default']:
-            self.queryset = self.queryset.filter(date__gte=str(today))
-
-        if is_wishlisted == 'True':
-            try:
-                event_ids = WishList.objects.filter(
-                    user=user_id, is_active=True).values_list('event__id', flat=True)
-                self.queryset = self.queryset.filter(id__in=event_ids)
-            except Exception as err:
-                logger.log_error(str(err))
-                return api_error_response(
-                    message="Some internal error coming in fetching the wishlist", status=400)
-
-        if subscription_type.lower() == SUBSCRIPTION_TYPE['free']:
-            self.queryset = self.queryset.filter(subscription_fee=0)
-
-        if subscription_type.lower() == SUBSCRIPTION_TYPE['paid']:
-            self.queryset = self.queryset.filter(subscription_fee__gt=0)
-
-        if search_text:
-            self.queryset = self.queryset.filter(
-                Q(location__icontains=search_text) | Q(name__icontains=search_text))
-        if event_created_by == 'True':
-            self.queryset = self.queryset.filter(event_created_by=user_id)
-        if event_type:
-            self.queryset = self.queryset.filter(type=event_type)
-        if start_date and end_date:
-            self.queryset = self.queryset.filter(date__range=[start_date, end_date])
-        if len(self.queryset) > 1:
-            self.queryset = self.queryset.annotate(diff=ExpressionWrapper(
-                F('sold_tickets') * 100000 / F('no_of_tickets'), output_field=IntegerField()))
-            self.queryset = self.queryset.order_by('-diff')
-        is_subscriber = (user_role == 'subscriber')
-
-        data = []
-
-        for curr_event in self.queryset:
-            response_obj = {"id": curr_event.id, "name": curr_event.name, "date": curr_event.date,
-                            "time": curr_event.time, "location": curr_event.location,
-                            "event_type": curr_event.type.id,
-                            "description": curr_event.description,
-                            "no_of_tickets": curr_event.no_of_tickets,
-                            "sold_tickets": curr_event.sold_tickets,
-                            "subscription_fee": curr_event.subscription_fee,
-                            "images": f"https://s3.{AWS_REGION}.amazonaws.com/{BUCKET}/{curr_event.images}",
-                            "external_links": curr_event.external_links,
-                            'is_free': curr_event.subscription_fee == 0,
-                            'feedback_count': UserFeedback.objects.filter(event_id=curr_event.id).count(),
-                            'event_status': event_status
-                            }
-            if event_status == EVENT_STATUS['all']:
-                response_obj['event_status'] = get_event_status(curr_event)
-            if is_subscriber:
-                # check for subscription
-                subscription_list = Subscription.objects.filter(
-                    user_id=user_logged_in, event_id=curr_event.id, is_active=True)
-                if subscription_list:
-                    is_subscribed = True
-                else:
-                    is_subscribed = False
-                response_obj['is_subscribed'] = is_subscribed
-
-                try:
-                    # check if the event is wish-listed
-                    WishList.objects.get(user_id=user_logged_in,
-                                         event_id=curr_event.id, is_active=True)
-                    response_obj['is_wishlisted'] = True
-                except WishList.DoesNotExist:
-                    response_obj['is_wishlisted'] = False
-
-                try:
-                    UserFeedback.objects.get(user_id=user_logged_in, event_id=curr_event.id, is_active=True)
-                    feedback_given = True
-                except UserFeedback.DoesNotExist:
-                    feedback_given = False
-                response_obj['feedback_given'] = feedback_given
-
-            data.append(response_obj)
+        try:
+            page = get_event_list_page(
+                request.GET, user_id, queryset, limit,
+                lambda curr_event: get_event_row(curr_event, event_status, fields))
+        except PaginationError as err:
+            logger.log_error(f"Invalid pagination parameters in event list request by user "
+                             f"{user_id}")
+            return api_error_response(message=str(err), status=400)
 
         logger.log_info(f"Event list fetched successfully by user_id {user_id}")
-        return api_success_response(message="List of events", data=data)
+        data = {'event_list': add_user_flags(page['rows'], flags, user_id),
+                'next_cursor': page['next_cursor']}
+        response = api_success_response(message="List of events", data=data)
+        return set_validators(response, etag, last_modified)
 
     def create(self, request, *args, **kwargs):
         """
         Create Api for Event
         """
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         logger.log_info(f"Event creation started by user {user_id}")
         if user_id != request.data["event_created_by"]:
             return api_error_response(message="You are not authorized to perform this action",
@@ -183,166 +151,74 @@ class EventViewSet(ModelViewSet):
         """
         Retrieve Api for Event
         """
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         user_logged_in = user_id
-        payment_access_token = payment_token(user_id)
-        payment_access_token = payment_access_token.decode('UTF-8')
+        event_id = int(kwargs.get('pk'))
+        logger.log_info(f"Fetch event details request by user {user_id} for event {event_id}")
+        try:
+            fields = get_requested_fields(request.GET.get('fields', None), EVENT_DETAIL_FIELDS)
+        except ValueError as err:
+            logger.log_error(f"Invalid fields in event details request: {err}")
+            return api_error_response(message=str(err), status=400)
+
+        etag, last_modified = get_event_validator(event_id, user_id)
+        if etag:
+            not_modified = conditional_response(request, etag, last_modified)
+            if not_modified:
+                logger.log_info(f"Event details not modified for event {event_id}")
+                return not_modified
 
         try:
-            user_role = UserProfile.objects.get(user_id=user_logged_in).role.role
+            user_role = get_user_role(request)
         except Exception:
             logger.log_error("Fetching of user role from object failed")
             return api_error_response(
                 message="Not able to fetch the role of the logged in user", status=500)
 
-        event_id = int(kwargs.get('pk'))
-        logger.log_info(f"Fetch event details request by user {user_id} for event {event_id}")
         try:
-            curr_event = Event.objects.get(id=event_id)
+            curr_event = Event.objects.only(*get_event_columns(fields)).get(id=event_id)
         except Event.DoesNotExist:
 
             logger.log_error("Invalid event_id {} provided in retrieve request".format(event_id))
             return api_error_response(message="Given event {} does not exist".format(event_id))
 
-        event_status = get_event_status(curr_event)
-
         if user_role != 'subscriber':
-            invitee_list = Invitation.objects.filter(event=curr_event.id,
-                                                     event__event_created_by_id=user_logged_in,
-                                                     is_active=True)
-
-            self_organised = (curr_event.event_created_by.id == user_logged_in)
-            invitee_data = []
-            for invited in invitee_list:
-                response_obj = {'invitation_id': invited.id, 'email': invited.email}
-                if invited.user is not None:
-                    try:
-                        user_profile = UserProfile.objects.get(user=invited.user.id)
-                        response_obj['user'] = {'user_id': invited.user.id,
-                                                'name': user_profile.name,
-                                                'contact_number': user_profile.contact_number,
-                                                'address': user_profile.address,
-                                                'organization': user_profile.organization}
-                    except UserProfile.DoesNotExist:
-                        pass
-                response_obj['discount_percentage'] = invited.discount_percentage
-                invitee_data.append(response_obj)
-            data = {"id": curr_event.id, "name": curr_event.name,
-                    "date": curr_event.date, "time": curr_event.time,
-                    "location": curr_event.location,
-                    "event_type": curr_event.type.id,
-                    "description": curr_event.description,
-                    "no_of_tickets": curr_event.no_of_tickets,
-                    "sold_tickets": curr_event.sold_tickets,
-                    "subscription_fee": curr_event.subscription_fee,
-                    "images": f"https://s3.{AWS_REGION}.amazonaws.com/{BUCKET}/{curr_event.images}",
-                    "external_links": curr_event.external_links,
-                    "invitee_list": invitee_data,
-                    "self_organised": self_organised, 'event_status': event_status,
-                    'feedback_count': UserFeedback.objects.filter(event_id=curr_event.id).count()}
+            data = {field: get_event_field(curr_event, field) for field in fields
+                    if field in EVENT_ROW_FIELDS}
+            if 'invitee_list' in fields:
+                data['invitee_list'] = get_invitee_list(curr_event.id, user_logged_in)
+            if 'self_organised' in fields:
+                data['self_organised'] = (curr_event.event_created_by_id == user_logged_in)
+            if 'event_status' in fields:
+                data['event_status'] = get_event_status(curr_event)
+            if 'feedback_count' in fields:
+                data['feedback_count'] = UserFeedback.objects.filter(event_id=curr_event.id).count()
             logger.log_info("Event details successfully returned !!!")
-            return api_success_response(message="event details", data=data, status=200)
+            response = api_success_response(message="event details", data=data, status=200)
+            return set_validators(response, etag, last_modified)
         else:
-            data = {"id": curr_event.id, "name": curr_event.name,
-                    "date": curr_event.date, "time": curr_event.time,
-                    "location": curr_event.location, "event_type": curr_event.type.id,
-                    "description": curr_event.description,
-                    "subscription_fee": curr_event.subscription_fee,
-                    "no_of_tickets": curr_event.no_of_tickets,
-                    "images": f"https://s3.{AWS_REGION}.amazonaws.com/{BUCKET}/{curr_event.images}",
-                    "external_links": curr_event.external_links, 'event_status': event_status
-                    }
-            try:
-                WishList.objects.get(user_id=user_logged_in, event_id=curr_event.id, is_active=True)
-                wishlisted = True
-            except WishList.DoesNotExist:
-                wishlisted = False
-            is_subscribed = False
-            try:
-                UserFeedback.objects.get(user_id=user_logged_in, event_id=event_id, is_active=True)
-                feedback_given = True
-            except UserFeedback.DoesNotExist:
-                feedback_given = False
-            try:
-                subscription_list = Subscription.objects.filter(
-                    user_id=user_id, event_id=curr_event.id,
-                    is_active=True)
-                if subscription_list:
-                    is_subscribed = True
-                    no_of_tickets_bought = int(sum(list(
-                        subscription_list.values_list('no_of_tickets', flat=True))))
-                    if curr_event.subscription_fee <= 0:
-                        # Free event
-                        total_amount_paid = 0
-                        total_discount_given = 0
-                        discount_percentage = 0
-                    else:
-                        # paid event
-                        payment_ids_list = Subscription.objects.filter(user=user_id, event=event_id,
-                                                                       is_active=True).values_list("id_payment")
-                        payment_ids_list = [_[0] for _ in payment_ids_list]
-                        payment_payload = {"list_of_payment_ids": payment_ids_list}
-                        payment_response = requests.get(PAYMENT_URL, data=json.dumps(payment_payload),
-                                                        headers={"Authorization": f"Bearer {payment_access_token}",
-                                                                 "Content-type": "application/json"})
-                        if payment_response.status_code != 200:
-                            return api_error_response(message="Error in fetching details from payment service",
-                                                      status=500)
-                        payment_object = payment_response.json().get('data')
-                        total_amount_paid = sum([item["total_amount"]
-                                                 if item["status"] == 0 else item["total_amount"] * (-1)
-                                                 for item in payment_object])
-                        total_discount_given = sum([item["discount_amount"]
-                                                    if item["status"] == 0 else item["discount_amount"] * (-1)
-                                                    for item in payment_object])
-
-                        try:
-                            discount_percentage = \
-                                Invitation.objects.get(user_id=user_id,
-                                                       event_id=curr_event.id,
-                                                       is_active=True).discount_percentage
-                        except Invitation.DoesNotExist:
-                            discount_percentage = 0
-                    created_on = subscription_list.order_by('created_on')[0].created_on
-                    data["subscription_details"] = {
-                        "no_of_tickets_bought": no_of_tickets_bought,
-                        "amount_paid": total_amount_paid,
-                        "discount_given": total_discount_given,
-                        "discount_percentage": discount_percentage,
-                        "created_on": datetime.strftime(created_on, "%Y-%m-%d")
-                    }
-                else:
-                    data["subscription_details"] = {}
-                    try:
-                        discount_allotted = \
-                            Invitation.objects.get(user=user_id,
-                                                   event=curr_event.id,
-                                                   is_active=True).discount_percentage
-                    except Invitation.DoesNotExist:
-                        discount_allotted = 0
-                    data['discount_percentage'] = discount_allotted
-            except Subscription.DoesNotExist:
-                try:
-                    discount_allotted = Invitation.objects.get(user=user_id,
-                                                               event=curr_event.id,
-                                                               is_active=True).discount_percentage
-                except Invitation.DoesNotExist:
-                    discount_allotted = 0
-                data['discount_percentage'] = discount_allotted
-                data["subscription_details"] = dict()
-            data['is_wishlisted'] = wishlisted
-            data["is_subscribed"] = is_subscribed
-            data['feedback_given'] = feedback_given
-            data["remaining_tickets"] = curr_event.no_of_tickets - curr_event.sold_tickets
+            data = {field: get_event_field(curr_event, field) for field in fields
+                    if field in EVENT_ROW_FIELDS and field != 'sold_tickets'}
+            if 'event_status' in fields:
+                data['event_status'] = get_event_status(curr_event)
+            if 'is_wishlisted' in fields:
+                data['is_wishlisted'] = WishList.objects.filter(
+                    user_id=user_logged_in, event_id=curr_event.id, is_active=True).exists()
+            if 'feedback_given' in fields:
+                data['feedback_given'] = UserFeedback.objects.filter(
+                    user_id=user_logged_in, event_id=event_id, is_active=True).exists()
+            if {'is_subscribed', 'subscription_details',
+                    'discount_percentage'}.intersection(fields):
+                data.update(get_subscription_details(curr_event, user_id))
+            if 'remaining_tickets' in fields:
+                data["remaining_tickets"] = curr_event.no_of_tickets - get_sold_tickets(curr_event)
+            data = {key: value for key, value in data.items() if key in fields}
             logger.log_info(f"Event details successfully returned for event {event_id}!!!")
-            return api_success_response(message="Event details", data=data, status=200)
+            response = api_success_response(message="Event details", data=data, status=200)
+            return set_validators(response, etag, last_modified)
 
     def destroy(self, request, *args, **kwargs):
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         event_id = int(kwargs.get('pk'))
         data = request.data
         message = data.get("message", "")
@@ -364,8 +240,9 @@ class EventViewSet(ModelViewSet):
             email=F('user__email'), users_id=F('user__id')).values("email", "users_id")
         email_ids = list({_["email"] for _ in user_obj})
         user_ids = list({_["users_id"] for _ in user_obj})
-        self.queryset.filter(id=event_id).update(is_cancelled=True)
-        self.queryset.filter(id=event_id).update(is_active=False)
+        self.queryset.filter(id=event_id).update(is_cancelled=True, is_active=False,
+                                                 updated_on=timezone.now())
+        bump_catalogue_version()
         if not testing:
             send_email_sms_and_notification(action_name="event_deleted",
                                             email_ids=email_ids,
@@ -383,16 +260,14 @@ class EventViewSet(ModelViewSet):
         :param kwargs: contains event id from the url given
         :return: changed response of an event
         """
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         event_id = int(kwargs.get('pk'))
         data = request.data
         testing = data.pop("testing", False)
         user_logged_in = user_id
         logger.log_info(f"Event update request started by user {user_id} for event {event_id}")
         try:
-            user_role = UserProfile.objects.get(user_id=user_logged_in).role.role
+            user_role = get_user_role(request)
         except Exception:
             logger.log_error(f"Event update request by user_id {user_id}: fetching of user role from object failed")
             return api_error_response(
@@ -476,6 +351,292 @@ class EventViewSet(ModelViewSet):
         return api_success_response(data=serializer.data, status=200)
 
 
+def get_event_list_parameters(params):
+    """
+    Function to validate the fields and pagination asked for in the event list request
+    :param params: query parameters of the request
+    :return: fields to return and the page size, None when the list is not paginated
+    """
+    fields = get_requested_fields(params.get('fields', None), EVENT_LIST_FIELDS)
+    limit = params.get('limit', None)
+    if limit or params.get('cursor', None):
+        limit = parse_limit(limit or MAX_PAGE_LIMIT, MAX_PAGE_LIMIT)
+    return fields, limit
+
+
+def filter_events(queryset, params, user_id):
+    """
+    Function to apply the filters of the event list request
+    :param queryset: queryset of the active events
+    :param params: query parameters of the request
+    :param user_id: id of the logged in user
+    :return: filtered queryset and the event status asked for
+    """
+    search_text = params.get("search", None)
+    event_type = params.get("event_type", None)
+    start_date = params.get("start_date", None)
+    end_date = params.get("end_date", None)
+    event_status = params.get('event_status', EVENT_STATUS['default'])
+    subscription_type = params.get('subscription_type', SUBSCRIPTION_TYPE['default'])
+
+    if event_status.lower() == EVENT_STATUS['all']:
+        queryset = Event.objects.all()
+        event_status = event_status.lower()
+    if event_status.lower() == EVENT_STATUS['completed']:
+        queryset = Event.objects.filter(is_active=False, is_cancelled=False)
+    if event_status.lower() == EVENT_STATUS['cancelled']:
+        queryset = Event.objects.filter(is_active=False, is_cancelled=True)
+    if event_status.lower() == EVENT_STATUS['default']:
+        queryset = queryset.filter(date__gte=str(date.today()))
+
+    if params.get('is_wishlisted', False) == 'True':
+        queryset = queryset.filter(id__in=WishList.objects.filter(
+            user=user_id, is_active=True).values_list('event__id', flat=True))
+    if subscription_type.lower() == SUBSCRIPTION_TYPE['free']:
+        queryset = queryset.filter(subscription_fee=0)
+    if subscription_type.lower() == SUBSCRIPTION_TYPE['paid']:
+        queryset = queryset.filter(subscription_fee__gt=0)
+    if search_text:
+        queryset = search_events(queryset, search_text)
+    if params.get("event_created_by", False) == 'True':
+        queryset = queryset.filter(event_created_by=user_id)
+    if event_type:
+        queryset = queryset.filter(type=event_type)
+    if start_date and end_date:
+        queryset = queryset.filter(date__range=[start_date, end_date])
+    return queryset, event_status
+
+
+def get_event_ordering(params):
+    """
+    Function to give the ordering of the event list, the searched events go by relevance first
+    :param params: query parameters of the request
+    :return: tuple of ordering fields, the last one is unique
+    """
+    ordering = ('-popularity', '-id')
+    if params.get("search", None):
+        ordering = ('-search_rank',) + ordering
+    return ordering
+
+
+def get_event_list_page(params, user_id, queryset, limit, build_row):
+    """
+    Function to get a page of the event list, shared through the catalogue cache unless it
+    depends on the wishlist of the user
+    :param params: query parameters of the request
+    :param user_id: id of the logged in user
+    :param queryset: filtered event queryset
+    :param limit: page size
+    :param build_row: function building the catalogue row of an event
+    :return: dict of the catalogue rows and the cursor of the next page
+    """
+    def build_page():
+        events, next_cursor = keyset_paginate(queryset, get_event_ordering(params), limit,
+                                              params.get('cursor', None))
+        return {'rows': [build_row(curr_event) for curr_event in events],
+                'next_cursor': next_cursor}
+
+    if params.get('is_wishlisted', False) == 'True':
+        # depends on the wishlist of the user, so it is not shared
+        return build_page()
+    cache_params = dict(params.lists())
+    if params.get("event_created_by", False) == 'True':
+        cache_params['user_id'] = user_id
+    return get_catalogue_page(cache_params, build_page)
+
+
+def add_user_flags(rows, flags, user_id):
+    """
+    Function to add the flags of the logged in user to catalogue rows
+    :param rows: catalogue rows
+    :param flags: flags asked for, empty for none
+    :param user_id: id of the logged in user
+    :return: list of rows
+    """
+    if not flags:
+        return rows
+    user_flags = get_user_event_flags(user_id)
+    return merge_user_event_flags(rows, {flag: user_flags[flag] for flag in flags})
+
+
+def annotate_feedback_count(queryset):
+    """
+    Annotates the feedback count of every event, so the event list is fetched in a single query
+    :param queryset: event queryset
+    :return: annotated queryset
+    """
+    feedback_count = UserFeedback.objects.filter(event=OuterRef('pk')).order_by().values(
+        'event').annotate(count=Count('id')).values('count')
+    return queryset.annotate(
+        feedback_count=Coalesce(Subquery(feedback_count, output_field=IntegerField()), 0))
+
+
+def get_event_row(curr_event, event_status, fields=EVENT_LIST_FIELDS):
+    """
+    Function to build the catalogue row of an event, it holds no user specific data
+    :param curr_event: event object, annotated with its feedback count when it is asked for
+    :param event_status: event status requested in the list
+    :param fields: response fields to build
+    :return: dict of the event details
+    """
+    response_obj = {}
+    for field in fields:
+        if field == 'event_status':
+            response_obj[field] = get_event_status(curr_event) \
+                if event_status == EVENT_STATUS['all'] else event_status
+        elif field not in USER_FLAG_FIELDS:
+            response_obj[field] = get_event_field(curr_event, field)
+    return response_obj
+
+
+def get_requested_fields(fields, allowed):
+    """
+    Function to read the sparse fieldset asked for with the fields query parameter
+    :param fields: comma separated field names, None for every field
+    :param allowed: fields the endpoint can return, in response order
+    :return: tuple of the fields to return, the id is always part of it
+    """
+    if not fields:
+        return allowed
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add('id')
+    return tuple(field for field in allowed if field in requested)
+
+
+def get_event_columns(fields):
+    """
+    Function to list the event columns needed to build the given fields, so the others can be
+    left out of the query
+    :param fields: response fields
+    :return: list of column names usable with only()
+    """
+    columns = ['id']
+    for field in fields:
+        for column in EVENT_FIELD_COLUMNS.get(field, (field,)):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def get_event_field(curr_event, field):
+    """
+    Function to read a field of the event response which is taken from the event row
+    :param curr_event: event object
+    :param field: response field
+    :return: value of the field
+    """
+    if field == 'event_type':
+        return curr_event.type_id
+    if field == 'images':
+        return f"https://s3.{AWS_REGION}.amazonaws.com/{BUCKET}/{curr_event.images}"
+    if field == 'is_free':
+        return curr_event.subscription_fee == 0
+    return getattr(curr_event, field)
+
+
+def get_invitee_list(event_id, user_id):
+    """
+    Function to list the invitees of an event organised by the user
+    :param event_id: id of the event
+    :param user_id: id of the logged in organizer
+    :return: list of invitation details
+    """
+    invitee_list = Invitation.objects.filter(event=event_id,
+                                             event__event_created_by_id=user_id,
+                                             is_active=True)
+    invitee_data = []
+    for invited in invitee_list:
+        response_obj = {'invitation_id': invited.id, 'email': invited.email}
+        if invited.user is not None:
+            try:
+                user_profile = UserProfile.objects.get(user=invited.user.id)
+                response_obj['user'] = {'user_id': invited.user.id,
+                                        'name': user_profile.name,
+                                        'contact_number': user_profile.contact_number,
+                                        'address': user_profile.address,
+                                        'organization': user_profile.organization}
+            except UserProfile.DoesNotExist:
+                pass
+        response_obj['discount_percentage'] = invited.discount_percentage
+        invitee_data.append(response_obj)
+    return invitee_data
+
+
+def get_subscription_details(curr_event, user_id):
+    """
+    Function to get the subscription of a subscriber to an event from the ticket balance
+    of the subscriber
+    :param curr_event: event object
+    :param user_id: id of the logged in subscriber
+    :return: dict with is_subscribed, subscription_details and, when not subscribed,
+    discount_percentage
+    """
+    balance = get_balance(user_id, curr_event.id)
+    try:
+        discount_percentage = Invitation.objects.get(user_id=user_id, event_id=curr_event.id,
+                                                     is_active=True).discount_percentage
+    except Invitation.DoesNotExist:
+        discount_percentage = 0
+    if balance is None:
+        return {'subscription_details': {}, 'discount_percentage': discount_percentage,
+                'is_subscribed': False}
+
+    if curr_event.subscription_fee <= 0:
+        # Free event
+        amount_paid = 0
+        discount_given = 0
+        discount_percentage = 0
+    else:
+        amount_paid = balance.amount_paid - balance.refunded_amount
+        discount_given = balance.discount_amount
+    return {'subscription_details': {
+        "no_of_tickets_bought": balance.no_of_tickets,
+        "amount_paid": amount_paid,
+        "discount_given": discount_given,
+        "discount_percentage": discount_percentage,
+        "created_on": datetime.strftime(balance.first_purchase_on, "%Y-%m-%d")
+    }, 'is_subscribed': True}
+
+
+def get_event_validator(event_id, user_id):
+    """
+    Function to derive the validator of the event details seen by a user in a single query,
+    from the last change of the event and of its subscriptions, wishlist, feedback and invitations.
+    The reservations of a sharded event do not touch the event row, so the sold tickets of its
+    shards are part of the etag.
+    :param event_id: id of the event
+    :param user_id: id of the logged in user
+    :return: etag and last modified timestamp, both None if the event does not exist
+    """
+    def last_change(queryset, field='updated_on'):
+        return Subquery(queryset.order_by().values('event').annotate(
+            last_change=Max(field)).values('last_change'))
+
+    shard_sold_tickets = Subquery(EventTicketShard.objects.filter(
+        event=OuterRef('pk')).order_by().values('event').annotate(
+            sold_tickets=Sum('sold_tickets')).values('sold_tickets'))
+
+    state = Event.objects.filter(id=event_id).annotate(
+        subscription_modified=last_change(
+            Subscription.objects.filter(event=OuterRef('pk'), user_id=user_id)),
+        wishlist_modified=last_change(
+            WishList.objects.filter(event=OuterRef('pk'), user_id=user_id)),
+        feedback_modified=last_change(UserFeedback.objects.filter(event=OuterRef('pk'))),
+        invitation_modified=last_change(Invitation.objects.filter(event=OuterRef('pk'))),
+        invitee_modified=last_change(Invitation.objects.filter(event=OuterRef('pk')),
+                                     'user__userprofile__updated_on'),
+        shard_sold_tickets=shard_sold_tickets,
+    ).values_list('updated_on', 'subscription_modified', 'wishlist_modified', 'feedback_modified',
+                  'invitation_modified', 'invitee_modified', 'shard_sold_tickets').first()
+    if state is None:
+        return None, None
+    last_modified = max(value for value in state[:-1] if value).timestamp()
+    return make_etag(user_id, *state), last_modified
+
+
 def get_event_status(curr_event):
     """
     common function to get event status
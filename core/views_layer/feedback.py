@@ -1,28 +1,28 @@
 import json
-import jwt
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import authentication_classes, permission_classes, api_view
-from rest_framework.authentication import get_authorization_header
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from authentication.backends import RoleClaimJWTAuthentication
 from core.models import Question, UserProfile, UserFeedback, Feedback, Event
 from core.serializers import FeedBackSerializer, QuestionSerializer
 from utils.permission import IsSubscriberOrReadOnly
-from eon_backend.settings.common import SECRET_KEY, LOGGER_SERVICE, BUCKET, AWS_REGION
+from eon_backend.settings.common import LOGGER_SERVICE, BUCKET, AWS_REGION
 
 from utils.common import api_success_response, api_error_response
+from utils.mixins import AuthenticatedUserMixin
+from utils.roles import get_user_role
 
 logger = LOGGER_SERVICE
 
 
-class FeedbackView(APIView):
+class FeedbackView(AuthenticatedUserMixin, APIView):
     """
     API for feedback
     """
     serializer_class = FeedBackSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (RoleClaimJWTAuthentication,)
     permission_classes = (IsAuthenticated, IsSubscriberOrReadOnly)
 
     def post(self, request):
@@ -32,9 +32,7 @@ class FeedbackView(APIView):
         :return: success response
         """
         logger.log_info("Feedback creation starts")
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
 
         data = json.loads(request.body)
         event_id = data['event_id']
@@ -75,9 +73,7 @@ class FeedbackView(APIView):
         :param request: in params pass event_id=<event_id>
         :return: Feedback list if success
         """
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
 
         event_id = request.GET.get("event_id", None)
         if not event_id:
@@ -90,8 +86,8 @@ class FeedbackView(APIView):
         except Exception:
             logger.log_error(f"Event_id {event_id} is invalid")
             return api_error_response(message="Provided event doesn't exist", status=400)
-        user_role = UserProfile.objects.get(user=request.user).role.role
-        if user_role == 'organizer' and event.event_created_by != request.user:
+        user_role = get_user_role(request)
+        if user_role == 'organizer' and event.event_created_by_id != request.user.id:
             logger.log_error(
                 f"Organizer with id {user_id} is not the owner of the event with id {event_id}")
             return api_error_response(message="You can only see feedback for self organized events",
@@ -125,7 +121,7 @@ class FeedbackView(APIView):
 
 
 @api_view(["GET"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([RoleClaimJWTAuthentication])
 @permission_classes([IsAuthenticated, ])
 def get_feedback_questions(request):
     """
@@ -3,30 +3,31 @@ Api related to invitation are here
 """
 import json
 
-import jwt
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import get_authorization_header
 from rest_framework import generics
 from django.db import transaction
 from django.db.models import F
+from django.utils import timezone
 
+from authentication.backends import RoleClaimJWTAuthentication
 from authentication.models import User
 from core.models import UserProfile, Invitation, Event
 from core.serializers import InvitationSerializer
 from utils.common import api_success_response, api_error_response
+from utils.mixins import AuthenticatedUserMixin
 from utils.helper import send_email_sms_and_notification
 from utils.permission import IsOrganizer
-from eon_backend.settings.common import SECRET_KEY, EVENT_URL, LOGGER_SERVICE
+from utils.streaming import iterate_in_chunks, streaming_success_response
+from eon_backend.settings.common import EVENT_URL, LOGGER_SERVICE
 
 logger = LOGGER_SERVICE
 
 
-class InvitationViewSet(generics.GenericAPIView):
+class InvitationViewSet(AuthenticatedUserMixin, generics.GenericAPIView):
     """
     Add Api from here
     """
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (RoleClaimJWTAuthentication,)
     permission_classes = (IsAuthenticated, IsOrganizer)
     serializer_class = InvitationSerializer
     queryset = Invitation.objects.filter(is_active=True)
@@ -45,9 +46,7 @@ class InvitationViewSet(generics.GenericAPIView):
         :return: Response with a list of all the generated invites
         """
         logger.log_info("Update Invitee list process started")
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         data = json.loads(request.body)
         event_id = data.get('event', None)
         discount_percentage = data.get('discount_percentage', 0)
@@ -78,7 +77,7 @@ class InvitationViewSet(generics.GenericAPIView):
                         self.queryset.filter(email=invitee, event=event_id).update(
                             event=event,
                             discount_percentage=discount_percentage,
-                            user=user, email=user.email
+                            user=user, email=user.email, updated_on=timezone.now()
                         )
                         response.append(inv_object)
                         number = UserProfile.objects.get(user=user)
@@ -91,7 +90,7 @@ class InvitationViewSet(generics.GenericAPIView):
                         self.queryset.filter(email=invitee, event=event_id).update(
                             event=event,
                             discount_percentage=discount_percentage,
-                            email=invitee,
+                            email=invitee, updated_on=timezone.now()
                         )
                         response.append(inv_object)
                     except Exception as err:
@@ -170,7 +169,8 @@ class InvitationViewSet(generics.GenericAPIView):
             email_ids = self.queryset.filter(id__in=list_of_ids).values_list("email")
             email_ids = [_[0] for _ in email_ids]
 
-            self.queryset.filter(id__in=list_of_ids).update(is_active=False)
+            self.queryset.filter(id__in=list_of_ids).update(is_active=False,
+                                                            updated_on=timezone.now())
             if not testing:
                 send_email_sms_and_notification(action_name="invitation_delete",
                                                 email_ids=email_ids,
@@ -186,7 +186,7 @@ class InvitationViewSet(generics.GenericAPIView):
         """
         Function to fetch invitation list
         :param request: may contain event_id or user_id to filter the invite list
-        :return: Invitation list
+        :return: Invitation list, streamed so it is never held in memory
         """
         event_id = request.GET.get('event_id')
         user_id = request.GET.get('user_id')
@@ -204,23 +204,34 @@ class InvitationViewSet(generics.GenericAPIView):
             queryset = Invitation.objects.filter(user=user_id, is_active=True)
         else:
             queryset = Invitation.objects.filter(is_active=True)
-        data = []
-        for invited in queryset:
-            response_obj = {'invitation_id': invited.id, 'email': invited.email}
-            if invited.user is not None:
-                try:
-                    user_profile = UserProfile.objects.get(user=invited.user.id)
-                    response_obj['user'] = {'user_id': invited.user.id, 'name': user_profile.name,
-                                            'contact_number': user_profile.contact_number,
-                                            'address': user_profile.address,
-                                            'organization': user_profile.organization}
-                except Exception:
-                    pass
-            response_obj['event'] = {'id': invited.event.id, 'name': invited.event.name,
-                                     'type': invited.event.type.type}
-            response_obj['discount_percentage'] = invited.discount_percentage
-            data.append(response_obj)
-        data_object = {'invitee_list': data}
-        logger.log_info(
-            f"Invitee list successfully fetched by user_id {user_id} for event {event_id}")
-        return api_success_response(message="Invitations details", data=data_object)
+        queryset = queryset.select_related('event__type')
+        logger.log_info(f"Invitee list streamed to user_id {user_id} for event {event_id}")
+        return streaming_success_response(iterate_in_chunks(queryset, get_invitation_rows),
+                                          message="Invitations details", key='invitee_list')
+
+
+def get_invitation_rows(invitations):
+    """
+    Function to build the invitee list rows, the profiles of the invited users are fetched
+    in a single query
+    :param invitations: invitation objects with their event and event type selected
+    :return: list of invitation details
+    """
+    invitations = list(invitations)
+    profiles = UserProfile.objects.in_bulk(
+        [invited.user_id for invited in invitations if invited.user_id is not None],
+        field_name='user_id')
+    data = []
+    for invited in invitations:
+        response_obj = {'invitation_id': invited.id, 'email': invited.email}
+        user_profile = profiles.get(invited.user_id)
+        if user_profile is not None:
+            response_obj['user'] = {'user_id': invited.user_id, 'name': user_profile.name,
+                                    'contact_number': user_profile.contact_number,
+                                    'address': user_profile.address,
+                                    'organization': user_profile.organization}
+        response_obj['event'] = {'id': invited.event.id, 'name': invited.event.name,
+                                 'type': invited.event.type.type}
+        response_obj['discount_percentage'] = invited.discount_percentage
+        data.append(response_obj)
+    return data
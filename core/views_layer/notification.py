@@ -1,27 +1,25 @@
 """
 Notification Module Related methods added here
 """
-import jwt
-
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import get_authorization_header
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from authentication.backends import RoleClaimJWTAuthentication
 from core.models import Notification
 from core.serializers import NotificationSerializer
-from eon_backend.settings.common import SECRET_KEY, LOGGER_SERVICE
+from eon_backend.settings.common import LOGGER_SERVICE
 
 from utils.common import api_success_response, api_error_response
+from utils.mixins import AuthenticatedUserMixin
 
 logger = LOGGER_SERVICE
 
 
-class NotificationView(APIView):
+class NotificationView(AuthenticatedUserMixin, APIView):
     """API for Notification"""
 
     serializer_class = NotificationSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (RoleClaimJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = Notification.objects.filter(has_read=False)
 
@@ -30,9 +28,7 @@ class NotificationView(APIView):
         Patch api method of notification
         """
 
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         list_of_ids = request.data.get('notification_ids')
 
         try:
@@ -49,9 +45,7 @@ class NotificationView(APIView):
         Get api method for Notification
         """
 
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
 
         try:
             notifications = self.queryset.filter(user=user_id).order_by("-created_on")
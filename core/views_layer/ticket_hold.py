@@ -0,0 +1,132 @@
+"""
+Api of the ticket holds are here, the tickets are held at once, paid in the request and
+confirmed in the background
+"""
+import json
+import time
+
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from authentication.backends import RoleClaimJWTAuthentication
+from core.holds import charge_ticket_hold, create_ticket_hold
+from core.idempotency import idempotent
+from core.models import Event, TicketHold
+from core.tasks import process_ticket_hold
+from eon_backend.settings.common import LOGGER_SERVICE, TICKET_HOLD_MAX_WAIT, \
+    TICKET_HOLD_POLL_INTERVAL, TICKET_HOLD_RETRY_AFTER
+from utils.common import api_error_response, api_success_response
+from utils.constants import TICKET_HOLD_STATUS
+from utils.mixins import AuthenticatedUserMixin
+from utils.permission import IsSubscriberOrReadOnly
+
+logger = LOGGER_SERVICE
+
+
+class TicketHoldViewSet(AuthenticatedUserMixin, viewsets.ViewSet):
+    """
+    Api methods for ticket holds added here
+    """
+    authentication_classes = (RoleClaimJWTAuthentication,)
+    permission_classes = (IsAuthenticated, IsSubscriberOrReadOnly)
+    queryset = TicketHold.objects.all()
+
+    @idempotent
+    def create(self, request):
+        """
+        Function to hold tickets of a paid event, pay them and queue their confirmation
+        :param request: event_id, no_of_tickets, card_number, expiry_month, expiry_year,
+                        amount, discount_amount, total_amount
+        :return: json response with the hold id, or error message
+        """
+        return start_ticket_hold(self.user_id, json.loads(request.body))
+
+    def retrieve(self, request, pk=None):
+        """
+        Function to get the status of a ticket hold of the logged in user. The wait sleeps in
+        the request, so it holds a sync worker for its whole length, which is why it is capped
+        at TICKET_HOLD_MAX_WAIT (2 seconds by default) and clients are told to poll again
+        :param request: may contain wait, the seconds to wait for a pending hold to be processed,
+                        at most TICKET_HOLD_MAX_WAIT
+        :param pk: id of the hold
+        :return: json response with the hold details, with a Retry-After header while pending
+        """
+        try:
+            wait = min(float(request.GET.get('wait', 0)), TICKET_HOLD_MAX_WAIT)
+        except ValueError:
+            return api_error_response(message="Wait must be a number", status=400)
+        holds = TicketHold.objects.filter(id=pk, user_id=self.user_id)
+        try:
+            status = holds.values_list('status', flat=True).get()
+        except (TicketHold.DoesNotExist, ValueError):
+            return api_error_response(message="Invalid hold id", status=404)
+        deadline = time.monotonic() + wait
+        while status == TICKET_HOLD_STATUS['pending'] and time.monotonic() < deadline:
+            time.sleep(min(TICKET_HOLD_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+            status = holds.values_list('status', flat=True).get()
+        hold = holds.select_related('subscription').get()
+        response = api_success_response(message="Ticket hold details", data=get_hold_details(hold))
+        if hold.status == TICKET_HOLD_STATUS['pending']:
+            response['Retry-After'] = TICKET_HOLD_RETRY_AFTER
+        return response
+
+
+def start_ticket_hold(user_id, data):
+    """
+    Function to hold tickets of a paid event for a user, charge the card and queue the
+    confirmation. The transaction only lasts for the reservation of the tickets, and the card
+    details are not kept once the charge is done.
+    :param user_id: id of the user
+    :param data: purchase request body
+    :return: 202 response with the hold details, or error response
+    """
+    event_id = data.get('event_id', None)
+    no_of_tickets = data.get('no_of_tickets', None)
+    amount = data.get('amount', None)
+
+    if not event_id or not isinstance(no_of_tickets, int) or no_of_tickets <= 0 or not amount:
+        logger.log_error("Event_id, a positive no_of_tickets and amount are mandatory for a hold")
+        return api_error_response(message="Request Parameters are invalid")
+
+    try:
+        event = Event.objects.only('id', 'subscription_fee').get(id=event_id, is_active=True)
+    except Event.DoesNotExist:
+        logger.log_error(f"Event_id {event_id} does not exist")
+        return api_error_response("Invalid event id")
+    if event.subscription_fee <= 0:
+        return api_error_response(message="Tickets of free events are not held")
+
+    hold = create_ticket_hold(user_id, event_id, no_of_tickets)
+    if hold is None:
+        logger.log_error(f"Number of tickets are invalid for hold request of user_id {user_id}")
+        return api_error_response(message="Requested number of tickets are more than available",
+                                  status=400)
+
+    payment_data = dict(card_number=data.get('card_number'), expiry_month=data.get('expiry_month'),
+                        expiry_year=data.get('expiry_year'), amount=amount,
+                        discount_amount=data.get('discount_amount'),
+                        total_amount=data.get('total_amount'), no_of_tickets=no_of_tickets)
+    hold.status = charge_ticket_hold(hold, payment_data)
+    if hold.status == TICKET_HOLD_STATUS['pending']:
+        process_ticket_hold.delay(hold.id)
+    logger.log_info(f"Ticket hold {hold.id} created for user_id {user_id}")
+    data = get_hold_details(hold)
+    data['status_url'] = f"/core/subscription-hold/{hold.id}/"
+    response = api_success_response(message="Tickets held", data=data, status=202)
+    response['Retry-After'] = TICKET_HOLD_RETRY_AFTER
+    return response
+
+
+def get_hold_details(hold):
+    """
+    Function to build the response of a hold
+    :param hold: hold object
+    :return: dict of the hold details
+    """
+    data = dict(hold_id=hold.id, event_id=hold.event_id, no_of_tickets=hold.no_of_tickets,
+                status=hold.status, expires_on=hold.expires_on)
+    if hold.subscription_id:
+        data.update(subscription_id=hold.subscription_id,
+                    payment_id=hold.subscription.id_payment,
+                    amount=hold.subscription.amount)
+    return data
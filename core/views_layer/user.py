@@ -1,26 +1,26 @@
 """
 User related functions are here
 """
-import jwt
-from rest_framework.authentication import get_authorization_header
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.viewsets import ModelViewSet
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from authentication.backends import RoleClaimJWTAuthentication
 from core.models import UserProfile, UserInterest
 from core.serializers import UserProfileSerializer
 from utils.common import api_error_response, api_success_response
-from eon_backend.settings.common import SECRET_KEY, LOGGER_SERVICE
+from utils.mixins import AuthenticatedUserMixin
+from utils.streaming import iterate_in_chunks, streaming_success_response
+from eon_backend.settings.common import LOGGER_SERVICE
 
 logger = LOGGER_SERVICE
 
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(AuthenticatedUserMixin, ModelViewSet):
     """
     User update function in this class
     """
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (RoleClaimJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
@@ -31,9 +31,7 @@ class UserViewSet(ModelViewSet):
         User update api created here
         """
         logger.log_info("User Profile Update Initialised")
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         data = request.data
         interest_list = []
         try:
@@ -81,38 +79,14 @@ class UserViewSet(ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         """
-        User list api created here
+        User list api created here, the list is streamed so it is never held in memory
         """
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
-
-        try:
-            user_logged_in = user_id
-            user_role = UserProfile.objects.get(user_id=user_logged_in).role.role
-        except Exception:
-            return api_error_response(message="Something went wrong", status=500)
-        data = []
-        for profile in self.queryset:
-            curr_profile = {'id': profile.user.id, 'name': profile.name,
-                            'contact_number': profile.contact_number,
-                            'address': profile.address, 'role': profile.role.id,
-                            'organization': profile.organization}
-            try:
-                list_of_interest = list(UserInterest.objects.filter(
-                    user=profile.user.id, is_active=True).values_list('event_type', flat=True))
-            except UserInterest.DoesNotExist:
-                list_of_interest = []
-            curr_profile['interests'] = list_of_interest
-
-            data.append(curr_profile)
-
-        return api_success_response(data=data, status=200)
+        user_id = self.user_id
+        logger.log_info(f"User list streamed to user_id {user_id}")
+        return streaming_success_response(iterate_in_chunks(self.queryset, get_profile_rows))
 
     def retrieve(self, request, *args, **kwargs):
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_logged_in = payload['user_id']
+        user_logged_in = self.user_id
         user_id = int(kwargs.get('user_id'))
 
         if user_logged_in != user_id:
@@ -135,3 +109,26 @@ class UserViewSet(ModelViewSet):
 
         logger.log_info(f"User details fetched successfully for user_id {user_id}")
         return api_success_response(data=curr_profile, message="user details", status=200)
+
+
+def get_profile_rows(profiles):
+    """
+    Function to build the user list rows, the interests of the users are fetched in a single query
+    :param profiles: user profile objects
+    :return: list of user details
+    """
+    profiles = list(profiles)
+    interests = {}
+    for interest in UserInterest.objects.filter(
+            user__in=[profile.user_id for profile in profiles], is_active=True).values(
+                'user_id', 'event_type'):
+        interests.setdefault(interest['user_id'], []).append(interest['event_type'])
+    data = []
+    for profile in profiles:
+        curr_profile = {'id': profile.user_id, 'name': profile.name,
+                        'contact_number': profile.contact_number,
+                        'address': profile.address, 'role': profile.role_id,
+                        'organization': profile.organization,
+                        'interests': interests.get(profile.user_id, [])}
+        data.append(curr_profile)
+    return data
@@ -3,27 +3,26 @@ All wish list related methods are here
 """
 import json
 
-import jwt
 from django.db import transaction
 from rest_framework import viewsets
-from rest_framework.authentication import get_authorization_header
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from authentication.backends import RoleClaimJWTAuthentication
 from core.models import WishList, Event
 from core.serializers import WishListSerializer
-from eon_backend.settings.common import SECRET_KEY, LOGGER_SERVICE
+from eon_backend.settings.common import LOGGER_SERVICE
 from utils.common import api_error_response, api_success_response
+from utils.mixins import AuthenticatedUserMixin
 from utils.permission import IsSubscriberOrReadOnly
 
 logger = LOGGER_SERVICE
 
 
-class WishListViewSet(viewsets.ViewSet):
+class WishListViewSet(AuthenticatedUserMixin, viewsets.ViewSet):
     """
     Wish list api created in this class
     """
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (RoleClaimJWTAuthentication,)
     permission_classes = (IsAuthenticated, IsSubscriberOrReadOnly)
     queryset = WishList.objects.filter(is_active=True)
 
@@ -35,9 +34,7 @@ class WishListViewSet(viewsets.ViewSet):
         logger.log_info("Wishlist creation started")
         data = json.loads(request.body)
         event_id = data.get('event_id', None)
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
 
         if user_id and event_id:
             data = dict(user=user_id, event=event_id)
@@ -82,9 +79,7 @@ class WishListViewSet(viewsets.ViewSet):
         """
         logger.log_info("Wishlist remove process started")
         event_id = pk
-        token = get_authorization_header(request).split()[1]
-        payload = jwt.decode(token, SECRET_KEY)
-        user_id = payload['user_id']
+        user_id = self.user_id
         if user_id and event_id:
             try:
                 instance = WishList.objects.get(event=event_id, user=user_id)
@@ -5,6 +5,7 @@ Celery setup
 import os
 
 from celery import Celery
+from celery.schedules import crontab
 
 # set the default Django settings module for the 'celery' program.
 # always default to local. QA/Production must be explicit
@@ -20,3 +21,27 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+# periodic tasks, run with `celery -A eon_backend beat`
+app.conf.beat_schedule = {
+    'expire-past-events': {
+        'task': 'core.tasks.expire_past_events',
+        'schedule': crontab(minute=0),
+    },
+    'reconcile-subscription-payments': {
+        'task': 'core.tasks.reconcile_subscription_payments',
+        'schedule': crontab(minute='*/15'),
+    },
+    'sync-sharded-sold-tickets': {
+        'task': 'core.tasks.sync_sharded_sold_tickets',
+        'schedule': crontab(),
+    },
+    'release-expired-ticket-holds': {
+        'task': 'core.tasks.release_expired_ticket_holds',
+        'schedule': crontab(),
+    },
+    'purge-expired-idempotency-keys': {
+        'task': 'core.tasks.purge_expired_idempotency_keys',
+        'schedule': crontab(minute=30),
+    },
+}
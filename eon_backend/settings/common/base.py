@@ -146,6 +146,33 @@ CORS_ORIGIN_ALLOW_ALL = True
 
 GRAPPELLI_ADMIN_TITLE = "BITS EOn"
 
+# Cache
+# the cache is shared through redis, the celery broker, so that the version bumps of the event
+# catalogue made by any worker or celery task reach every worker; the process local cache is
+# only used when no redis is configured, for a single process in development and tests
+CACHE_LOCATION = os.environ.get("CACHE_LOCATION", os.environ.get("BROKER_URL"))
+if CACHE_LOCATION:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": CACHE_LOCATION,
+            "KEY_PREFIX": "eon",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+CATALOGUE_CACHE_TIMEOUT = int(os.environ.get("CATALOGUE_CACHE_TIMEOUT", 300))
+USER_FLAGS_CACHE_TIMEOUT = int(os.environ.get("USER_FLAGS_CACHE_TIMEOUT", 300))
+# seconds the role and token version of a user stay in the cache
+USER_ROLE_CACHE_TIMEOUT = int(os.environ.get("USER_ROLE_CACHE_TIMEOUT", 60))
+# active state of the users authenticated from their token, kept in the process memory
+ACTIVE_USER_CACHE_SIZE = int(os.environ.get("ACTIVE_USER_CACHE_SIZE", 4096))
+ACTIVE_USER_CACHE_TIMEOUT = int(os.environ.get("ACTIVE_USER_CACHE_TIMEOUT", 30))
+
 # Simple-JWT Authentication
 # https://pypi.org/project/djangorestframework-simplejwt/
 
@@ -183,6 +210,37 @@ NOTIFICATION_CONFIG = NOTIFICATION_CONFIG
 
 EVENT_URL = os.environ.get("EVENT_URL", "")
 PAYMENT_URL = os.environ.get("PAYMENT_URL", "")
+# payment service client: timeouts in seconds, retries of failed calls and circuit breaker
+PAYMENT_CONNECT_TIMEOUT = float(os.environ.get("PAYMENT_CONNECT_TIMEOUT", 3.05))
+PAYMENT_READ_TIMEOUT = float(os.environ.get("PAYMENT_READ_TIMEOUT", 10))
+PAYMENT_MAX_RETRIES = int(os.environ.get("PAYMENT_MAX_RETRIES", 2))
+PAYMENT_RETRY_BACKOFF = float(os.environ.get("PAYMENT_RETRY_BACKOFF", 0.2))
+PAYMENT_POOL_SIZE = int(os.environ.get("PAYMENT_POOL_SIZE", 20))
+PAYMENT_FAILURE_THRESHOLD = int(os.environ.get("PAYMENT_FAILURE_THRESHOLD", 5))
+PAYMENT_RESET_TIMEOUT = float(os.environ.get("PAYMENT_RESET_TIMEOUT", 30))
+# tokens of the payment service are reused until refresh margin seconds before they expire
+PAYMENT_TOKEN_LIFETIME = int(os.environ.get("PAYMENT_TOKEN_LIFETIME", 900))
+PAYMENT_TOKEN_REFRESH_MARGIN = int(os.environ.get("PAYMENT_TOKEN_REFRESH_MARGIN", 60))
+PAYMENT_TOKEN_CACHE_SIZE = int(os.environ.get("PAYMENT_TOKEN_CACHE_SIZE", 4096))
+# seconds the tickets of a hold stay reserved while its payment is processed
+TICKET_HOLD_TIMEOUT = int(os.environ.get("TICKET_HOLD_TIMEOUT", 300))
+# longest wait, in seconds, of a long-polled ticket hold status and the interval of its checks,
+# kept short as the wait holds a worker, and the seconds a client is told to wait before polling
+# a pending hold again
+TICKET_HOLD_MAX_WAIT = float(os.environ.get("TICKET_HOLD_MAX_WAIT", 2))
+TICKET_HOLD_POLL_INTERVAL = float(os.environ.get("TICKET_HOLD_POLL_INTERVAL", 0.5))
+TICKET_HOLD_RETRY_AFTER = int(os.environ.get("TICKET_HOLD_RETRY_AFTER", 1))
+# seconds the responses stored under an Idempotency-Key are replayed
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 86400))
+# seconds a request holds its Idempotency-Key, a retry takes over the key of a request which
+# died before storing its response; it must outlast the slowest purchase with its payment retries
+IDEMPOTENCY_KEY_LEASE = int(os.environ.get("IDEMPOTENCY_KEY_LEASE", 120))
+
+# largest page size allowed for cursor paginated lists
+MAX_PAGE_LIMIT = int(os.environ.get("MAX_PAGE_LIMIT", 100))
+
+# rows fetched per database round trip by the streamed list responses
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 500))
 
 # rest framework
 REST_FRAMEWORK = {
@@ -1,11 +1,20 @@
 """
 Common methods are here
 """
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import status as http_status
 from rest_framework.response import Response
+from rest_framework_simplejwt.settings import api_settings
 
-from eon_backend.settings.common import ENCODE_KEY
+from eon_backend.settings.common import ENCODE_KEY, PAYMENT_TOKEN_LIFETIME, \
+    PAYMENT_TOKEN_REFRESH_MARGIN, PAYMENT_TOKEN_CACHE_SIZE
 
 
 def api_error_response(message, status=None):
@@ -47,6 +56,49 @@ def api_success_response(message=None, data=None, status=None):
     return Response(status=status)
 
 
+def get_user_id(request):
+    """
+    returns the id of the logged in user from the token validated by the authentication class
+    :param request: authenticated request
+    :return: user id
+    """
+    return request.auth[api_settings.USER_ID_CLAIM]
+
+
+def make_etag(*parts):
+    """
+    Function to build a strong entity tag from the values the response depends on
+    :param parts: values identifying the state of the response
+    :return: quoted etag
+    """
+    digest = hashlib.md5(":".join(str(part) for part in parts).encode('UTF-8')).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    returns a 304 response if the client already has the current representation
+    :param request: request having If-None-Match or If-Modified-Since headers
+    :param etag: current entity tag of the resource
+    :param last_modified: unix timestamp of the last change of the resource
+    :return: 304 response or None when the payload must be built
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Sets the ETag and Last-Modified headers of a response
+    :return: the response
+    """
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
 default_password = 'default'
 
 
@@ -71,7 +123,62 @@ def produce_object_for_user(user):
     return response
 
 
+class PaymentTokenCache:
+    """
+    Least recently used cache of the payment service tokens of the users, shared by the
+    threads of a worker. A token is signed again once it is within refresh_margin seconds
+    of its expiry, so a token handed out is always valid for at least that long.
+    """
+
+    def __init__(self, size, lifetime, refresh_margin):
+        self.size = size
+        self.lifetime = lifetime
+        self.refresh_margin = refresh_margin
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Function to get a valid token of a user
+        :param user_id: id of the user
+        :return: encoded token
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] - self.refresh_margin > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        expires_at = int(now) + self.lifetime
+        token = jwt.encode({'user_id': user_id, 'exp': expires_at}, ENCODE_KEY, algorithm="HS256")
+        with self._lock:
+            self._entries[user_id] = (expires_at, token)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return token
+
+    def stats(self):
+        """
+        Function to get the counters of the cache
+        :return: dict with hits, misses and the number of cached tokens
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+payment_tokens = PaymentTokenCache(PAYMENT_TOKEN_CACHE_SIZE, PAYMENT_TOKEN_LIFETIME,
+                                   PAYMENT_TOKEN_REFRESH_MARGIN)
+
+
 def payment_token(user_id):
-    payload = {'user_id': user_id}
-    encoded_jwt = jwt.encode(payload, ENCODE_KEY, algorithm="HS256")
-    return encoded_jwt
+    """
+    returns the token of a user for the payment service, reused until it nears its expiry
+    :param user_id: id of the user
+    :return: encoded token
+    """
+    return payment_tokens.get(user_id)
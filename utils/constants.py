@@ -89,6 +89,8 @@ NOTIFICATION_CONFIG = {
 
 EVENT_STATUS = dict(default='upcoming', completed='completed', cancelled='cancelled', all='all')
 SUBSCRIPTION_TYPE = dict(default='all', free='free', paid='paid')
+TICKET_HOLD_STATUS = dict(pending='pending', confirmed='confirmed', failed='failed',
+                          expired='expired')
 
 MONTH = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
          'November', 'December']
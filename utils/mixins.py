@@ -0,0 +1,18 @@
+"""
+Mixins shared by the api views are here
+"""
+from utils.common import get_user_id
+
+
+class AuthenticatedUserMixin:
+    """
+    Exposes the id of the logged in user, read from the token the authentication class has
+    already validated instead of decoding the authorization header again
+    """
+
+    @property
+    def user_id(self):
+        """
+        id of the logged in user
+        """
+        return get_user_id(self.request)
@@ -0,0 +1,101 @@
+"""
+Keyset (cursor) pagination helpers are here
+"""
+import base64
+import binascii
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class PaginationError(ValueError):
+    """
+    Raised when the cursor or limit given by the client is invalid
+    """
+
+
+def encode_cursor(values):
+    """
+    Function to build an opaque cursor from the ordering values of the last row of a page
+    :param values: list of ordering values
+    :return: url safe cursor string
+    """
+    raw = json.dumps(values, cls=DjangoJSONEncoder).encode('UTF-8')
+    return base64.urlsafe_b64encode(raw).decode('UTF-8')
+
+
+def decode_cursor(cursor, length):
+    """
+    Function to read the ordering values back from a cursor
+    :param cursor: cursor string received from the client
+    :param length: number of ordering values expected in the cursor
+    :return: list of ordering values
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('UTF-8')).decode('UTF-8'))
+    except (binascii.Error, UnicodeError, ValueError) as err:
+        raise PaginationError("Cursor is invalid") from err
+    if not isinstance(values, list) or len(values) != length:
+        raise PaginationError("Cursor is invalid")
+    return values
+
+
+def _row_value(row, field):
+    if isinstance(row, dict):
+        return row[field]
+    return getattr(row, field)
+
+
+def keyset_filter(ordering, values):
+    """
+    Function to build the filter selecting rows placed after the given ordering values
+    :param ordering: ordering fields, '-' prefixed for descending, last one must be unique
+    :param values: ordering values of the last row already returned
+    :return: Q object
+    """
+    condition = Q()
+    equal_fields = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal_fields, **{f'{name}__{lookup}': value})
+        equal_fields[name] = value
+    return condition
+
+
+def keyset_paginate(queryset, ordering, limit, cursor=None):
+    """
+    Function to fetch a single page of a queryset ordered by the given keys, every page
+    costs the same as the first one as no OFFSET is used
+    :param queryset: queryset to paginate
+    :param ordering: ordering fields, '-' prefixed for descending, last one must be unique
+    :param limit: maximum number of rows in the page
+    :param cursor: cursor returned with the previous page
+    :return: rows of the page and the cursor of the next page (None on the last page)
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(ordering))
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([_row_value(rows[-1], field.lstrip('-')) for field in ordering])
+    return rows, next_cursor
+
+
+def parse_limit(limit, max_limit):
+    """
+    Function to validate the page size given by the client
+    :param limit: limit query parameter
+    :param max_limit: largest page size allowed
+    :return: page size as int
+    """
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError) as err:
+        raise PaginationError("Limit must be a number") from err
+    if limit <= 0:
+        raise PaginationError("Limit must be greater than zero")
+    return min(limit, max_limit)
@@ -0,0 +1,208 @@
+"""
+Client of the payment service, all the calls share a pooled keep-alive session
+"""
+import json
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from eon_backend.settings.common import LOGGER_SERVICE, PAYMENT_CONNECT_TIMEOUT, \
+    PAYMENT_READ_TIMEOUT, PAYMENT_MAX_RETRIES, PAYMENT_RETRY_BACKOFF, PAYMENT_POOL_SIZE, \
+    PAYMENT_FAILURE_THRESHOLD, PAYMENT_RESET_TIMEOUT
+from utils.common import payment_token
+
+logger = LOGGER_SERVICE
+
+# a payment may have been taken once the request was sent, so a create is only retried
+# when the connection could not be made
+RETRYABLE_ERRORS = {'GET': (requests.ConnectionError, requests.Timeout),
+                    'POST': (requests.ConnectTimeout,)}
+
+
+class PaymentServiceError(Exception):
+    """
+    Raised when the payment service cannot be reached or answers with an error
+    """
+
+
+class CircuitOpenError(PaymentServiceError):
+    """
+    Raised without calling the payment service while it is considered unhealthy
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures, then lets a single trial call
+    through once reset_timeout seconds have passed
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Function to tell if a call may be made
+        :return: True when closed, or when open for long enough to try again
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # half open, the next failure opens it again for a full timeout
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Function to close the circuit after a successful call
+        """
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        """
+        Function to count a failed call, the circuit opens at failure_threshold in a row
+        """
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class PaymentClient:
+    """
+    Payment service client with connect and read timeouts, bounded retries with jittered
+    backoff and a circuit breaker failing fast while the service is down
+    """
+
+    def __init__(self, url=None, connect_timeout=PAYMENT_CONNECT_TIMEOUT,
+                 read_timeout=PAYMENT_READ_TIMEOUT, max_retries=PAYMENT_MAX_RETRIES,
+                 backoff=PAYMENT_RETRY_BACKOFF, pool_size=PAYMENT_POOL_SIZE,
+                 failure_threshold=PAYMENT_FAILURE_THRESHOLD, reset_timeout=PAYMENT_RESET_TIMEOUT):
+        self._url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def url(self):
+        """
+        :return: url of the payment service, read on every call so the service can be pointed
+                 elsewhere without a restart
+        """
+        return self._url or settings.PAYMENT_URL
+
+    @property
+    def session(self):
+        """
+        :return: keep-alive session shared by the calls, created on first use
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                          max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def request(self, method, user_id, payload):
+        """
+        Function to call the payment service
+        :param method: GET or POST
+        :param user_id: id of the user the call is made for
+        :param payload: json body
+        :return: response of the service, for any status below 500
+        """
+        if not self.url:
+            raise PaymentServiceError("Payment service url is not configured")
+        if not self.breaker.allow():
+            raise CircuitOpenError("Payment service is unavailable")
+        headers = {"Authorization": f"Bearer {payment_token(user_id).decode('UTF-8')}",
+                   "Content-type": "application/json"}
+        body = json.dumps(payload)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(method, self.url, data=body, headers=headers,
+                                                timeout=self.timeout)
+            except requests.RequestException as err:
+                self.breaker.record_failure()
+                error = err
+                retryable = isinstance(err, RETRYABLE_ERRORS[method])
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                error = f"status {response.status_code}"
+                retryable = method == 'GET'
+            logger.log_error(f"Payment service {method} failed on attempt {attempt + 1}: {error}")
+            if not retryable or attempt == self.max_retries or not self.breaker.allow():
+                break
+            # full jitter, so the retries of many workers do not hit the service together
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        raise PaymentServiceError(f"Payment service {method} failed: {error}")
+
+    def create_payment(self, user_id, data):
+        """
+        Function to charge or refund a user
+        :param user_id: id of the user
+        :param data: card and amount details
+        :return: payment details returned by the service
+        """
+        response = self.request('POST', user_id, data)
+        if response.status_code != 200:
+            raise PaymentServiceError(f"Payment rejected with status {response.status_code}")
+        return response.json().get('data')
+
+    def refund_payment(self, user_id, data, payment_object):
+        """
+        Function to give back a payment taken for tickets that could not be sold
+        :param user_id: id of the user
+        :param data: card and amount details the payment was made with
+        :param payment_object: payment details returned by the service
+        :return: refund details returned by the service, None if the refund failed
+        """
+        refund_data = dict(data, amount=-data['amount'],
+                           discount_amount=-(data.get('discount_amount') or 0),
+                           total_amount=-payment_object['total_amount'],
+                           no_of_tickets=-data['no_of_tickets'])
+        try:
+            refund_object = self.create_payment(user_id, refund_data)
+        except PaymentServiceError as err:
+            logger.log_error(f"Refund of payment {payment_object['id']} failed: {err}")
+            return None
+        logger.log_info(f"Payment {payment_object['id']} refunded as {refund_object['id']}")
+        return refund_object
+
+    def get_payments(self, user_id, payment_ids):
+        """
+        Function to fetch the details of payments of a user
+        :param user_id: id of the user
+        :param payment_ids: list of payment ids
+        :return: list of payment details
+        """
+        response = self.request('GET', user_id, {"list_of_payment_ids": payment_ids})
+        if response.status_code != 200:
+            raise PaymentServiceError(f"Payment details failed with status {response.status_code}")
+        return response.json().get('data')
+
+
+payment_client = PaymentClient()
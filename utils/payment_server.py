@@ -0,0 +1,145 @@
+"""
+Local stand-in for the payment service, used by the tests and the benchmarks
+
+Run it standalone with: python -m utils.payment_server --port 8001 [--delay 0.05]
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATUS_SUCCESS = 0
+STATUS_REFUND = 3
+
+
+class PaymentRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the two calls of the payment service: POST to pay or refund, GET to list payments
+    """
+    protocol_version = 'HTTP/1.1'
+    body = None
+
+    def log_message(self, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, status, body):
+        content = json.dumps(body).encode('UTF-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _pre_handle(self):
+        # the body is read first so a keep-alive connection is left clean for the next call
+        self.body = self._read_json()
+        server = self.server
+        if server.delay:
+            time.sleep(server.delay)
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self._send_json(401, {"message": "Authorization is missing"})
+            return False
+        if server.fail_next > 0:
+            server.fail_next -= 1
+            self._send_json(503, {"message": "Service unavailable"})
+            return False
+        return True
+
+    def do_POST(self):
+        """
+        Function to take a payment, or a refund when the amount is negative
+        :return: payment details, 400 for an invalid or expired card
+        """
+        if not self._pre_handle():
+            return
+        data = self.body
+        card_number = data.get('card_number')
+        today = date.today()
+        if not isinstance(card_number, int) or len(str(card_number)) != 16:
+            self._send_json(400, {"message": "Invalid card number"})
+            return
+        expiry = (data.get('expiry_year') or 0, data.get('expiry_month') or 0)
+        if expiry < (today.year, today.month):
+            self._send_json(400, {"message": "Card has expired"})
+            return
+        amount = data.get('amount') or 0
+        discount_amount = data.get('discount_amount') or 0
+        total_amount = data.get('total_amount')
+        if total_amount is None:
+            total_amount = amount - discount_amount
+        payment = {"id": next(self.server.ids),
+                   "status": STATUS_REFUND if amount < 0 else STATUS_SUCCESS,
+                   "amount": abs(amount), "discount_amount": abs(discount_amount),
+                   "total_amount": abs(total_amount), "no_of_tickets": data.get('no_of_tickets')}
+        self.server.payments[payment['id']] = payment
+        self._send_json(200, {"data": payment})
+
+    def do_GET(self):
+        """
+        Function to list the payments whose ids are given in list_of_payment_ids
+        :return: payment details, unknown ids are left out
+        """
+        if not self._pre_handle():
+            return
+        payment_ids = self.body.get('list_of_payment_ids', [])
+        payments = [self.server.payments[payment_id] for payment_id in payment_ids
+                    if payment_id in self.server.payments]
+        self._send_json(200, {"data": payments})
+
+
+class PaymentServer(ThreadingHTTPServer):
+    """
+    Threaded payment service keeping its payments in memory
+    :param port: port to listen on, 0 picks a free one
+    :param delay: seconds every call waits before answering, to mimic a slow service
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, delay=0):
+        super().__init__(('127.0.0.1', port), PaymentRequestHandler)
+        self.delay = delay
+        self.fail_next = 0
+        self.payments = {}
+        self.ids = itertools.count(1)
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        :return: url of the payment api of the server
+        """
+        return f"http://127.0.0.1:{self.server_address[1]}/payment"
+
+    def start(self):
+        """
+        Function to serve in a background thread
+        :return: the server
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Function to stop serving and release the port
+        """
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0)
+    options = parser.parse_args()
+    payment_server = PaymentServer(options.port, options.delay)
+    print(f"Payment service listening on {payment_server.url}")
+    payment_server.serve_forever()
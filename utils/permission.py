@@ -3,7 +3,7 @@ Custom based permissions for each function
 """
 
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from core.models import UserProfile
+from utils.roles import get_user_role
 
 
 class IsOrganizerOrReadOnlySubscriber(BasePermission):
@@ -16,10 +16,10 @@ class IsOrganizerOrReadOnlySubscriber(BasePermission):
         if request.method in SAFE_METHODS:
             return True
 
-        return UserProfile.objects.get(user=request.user).role.role in ['organizer', 'admin']
+        return get_user_role(request) in ['organizer', 'admin']
 
     def has_object_permission(self, request, view, obj):
-        return request.user == obj.user
+        return request.user.id == obj.user_id
 
 
 class IsOrganizer(BasePermission):
@@ -28,7 +28,7 @@ class IsOrganizer(BasePermission):
     """
 
     def has_permission(self, request, view):
-        return UserProfile.objects.get(user=request.user).role.role in ["organizer", "admin"]
+        return get_user_role(request) in ["organizer", "admin"]
 
 
 class IsSubscriberOrReadOnly(BasePermission):
@@ -41,7 +41,7 @@ class IsSubscriberOrReadOnly(BasePermission):
         if request.method in SAFE_METHODS:
             return True
 
-        return UserProfile.objects.get(user=request.user).role.role == "subscriber"
+        return get_user_role(request) == "subscriber"
 
 
 class IsOwnerOrNotSubscriber(BasePermission):
@@ -51,10 +51,10 @@ class IsOwnerOrNotSubscriber(BasePermission):
     """
 
     def has_permission(self, request, view):
-        if UserProfile.objects.get(user=request.user).role.role == "subscriber":
+        if get_user_role(request) == "subscriber":
             if view.action == "list":
                 return False
         return True
 
     def has_object_permission(self, request, view, obj):
-        return request.user == obj.user
+        return request.user.id == obj.user_id
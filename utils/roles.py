@@ -0,0 +1,87 @@
+"""
+Request scoped resolver of the role of the logged in user
+"""
+from django.core.cache import cache
+from django.db.models import F
+
+from eon_backend.settings.common import USER_ROLE_CACHE_TIMEOUT
+
+TOKEN_VERSION_KEY = "token_version:{user_id}"
+USER_ROLE_KEY = "user_role:{user_id}"
+
+
+def _get_http_request(request):
+    # permissions and views share the underlying django request even when wrapped by DRF
+    return getattr(request, '_request', request)
+
+
+def _load_role(user_id):
+    from core.models import UserProfile
+
+    key = USER_ROLE_KEY.format(user_id=user_id)
+    role = cache.get(key)
+    if role is None:
+        role = UserProfile.objects.filter(user_id=user_id).values_list('role__role',
+                                                                       flat=True).get()
+        cache.set(key, role, USER_ROLE_CACHE_TIMEOUT)
+    return role
+
+
+def get_user_role(request):
+    """
+    Function to get the role name of the logged in user, taken from the signed claims of the
+    access token when the request was authenticated with them, else loaded at most once per
+    request and cached for USER_ROLE_CACHE_TIMEOUT seconds
+    :param request: authenticated request
+    :return: role name, raises UserProfile.DoesNotExist if the user has no profile
+    """
+    role = getattr(request.user, 'role', None)
+    if role is not None:
+        return role
+    http_request = _get_http_request(request)
+    role = getattr(http_request, '_user_role', None)
+    if role is None:
+        role = _load_role(request.user.id)
+        http_request._user_role = role
+    return role
+
+
+def get_token_version(user_id):
+    """
+    Function to get the current token version of a user, tokens carrying another version
+    were issued before a change of role and are no longer accepted
+    :param user_id: id of the user
+    :return: token version, None if the user has no profile
+    """
+    from core.models import UserProfile
+
+    key = TOKEN_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = UserProfile.objects.filter(user_id=user_id).values_list(
+            'token_version', flat=True).first()
+        if version is not None:
+            cache.set(key, version, USER_ROLE_CACHE_TIMEOUT)
+    return version
+
+
+def revoke_user_tokens(user_ids):
+    """
+    Function to revoke every token issued to the given users, used when they are blocked
+    :param user_ids: ids of the users
+    """
+    from core.models import UserProfile
+
+    UserProfile.objects.filter(user_id__in=user_ids).update(token_version=F('token_version') + 1)
+    for user_id in user_ids:
+        invalidate_user_profile(user_id)
+
+
+def invalidate_user_profile(user_id):
+    """
+    Function to drop the cached role and token version of a user, called whenever the profile
+    is saved
+    :param user_id: id of the user
+    """
+    cache.delete_many([USER_ROLE_KEY.format(user_id=user_id),
+                       TOKEN_VERSION_KEY.format(user_id=user_id)])
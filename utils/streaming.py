@@ -0,0 +1,125 @@
+"""
+Streaming JSON, NDJSON and CSV responses for the large list endpoints are here
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import status as http_status
+
+from eon_backend.settings.common import STREAM_CHUNK_SIZE
+
+
+def iterate_in_chunks(queryset, build_rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Function to iterate a queryset without loading it in memory, the rows are built a chunk
+    at a time so related data can be fetched with one query per chunk
+    :param queryset: queryset to iterate
+    :param build_rows: function taking a list of objects and returning their rows
+    :param chunk_size: number of objects fetched per database round trip
+    :return: generator of rows
+    """
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield from build_rows(chunk)
+            chunk = []
+    if chunk:
+        yield from build_rows(chunk)
+
+
+def _encode_json(rows, message, key, chunk_size):
+    encoder = DjangoJSONEncoder()
+    yield '{"data": {%s: [' % encoder.encode(key) if key else '{"data": ['
+    buffer = []
+    separator = ''
+    for row in rows:
+        buffer.append(separator + encoder.encode(row))
+        separator = ', '
+        if len(buffer) == chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+    end = ']}' if key else ']'
+    if message:
+        end += ', "message": ' + json.dumps(message)
+    yield end + '}'
+
+
+def streaming_success_response(rows, message=None, key=None, status=None,
+                               chunk_size=STREAM_CHUNK_SIZE):
+    """
+    returns the same body as api_success_response, written while the rows are produced
+    so the whole list is never held in memory
+    :param rows: iterable of json serializable rows
+    :param message: message to indicate the status of response
+    :param key: when given the rows are nested as {"data": {key: rows}}
+    :param status: status
+    :param chunk_size: number of rows written at once
+    :return: streaming response
+    """
+    if not status:
+        status = http_status.HTTP_200_OK
+    return StreamingHttpResponse(_encode_json(rows, message, key, chunk_size), status=status,
+                                 content_type='application/json')
+
+
+class _Echo:
+    """
+    File like object handing back what the csv writer writes, so each line can be yielded
+    """
+
+    def write(self, value):
+        return value
+
+
+def _encode_csv(rows, fields, chunk_size):
+    writer = csv.writer(_Echo())
+    buffer = [writer.writerow(fields)]
+    for row in rows:
+        buffer.append(writer.writerow([row[field] for field in fields]))
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _encode_ndjson(rows, chunk_size):
+    encoder = DjangoJSONEncoder()
+    buffer = []
+    for row in rows:
+        buffer.append(encoder.encode(row) + '\n')
+        if len(buffer) == chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def streaming_csv_response(rows, fields, filename, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    returns a csv attachment written while the rows are produced
+    :param rows: iterable of dict rows
+    :param fields: keys of the rows written as columns, also the header line
+    :param filename: name of the downloaded file
+    :param chunk_size: number of rows written at once
+    :return: streaming response
+    """
+    response = StreamingHttpResponse(_encode_csv(rows, fields, chunk_size), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def streaming_ndjson_response(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    returns newline delimited json, one row per line, written while the rows are produced
+    :param rows: iterable of json serializable rows
+    :param chunk_size: number of rows written at once
+    :return: streaming response
+    """
+    return StreamingHttpResponse(_encode_ndjson(rows, chunk_size),
+                                 content_type='application/x-ndjson')